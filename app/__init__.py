@@ -1,5 +1,8 @@
 from flask import Flask
 from .config import Config
+from .compressao import init_compressao
+from .json_provider import init_json
+from .services.perfil_service import init_perfil
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
@@ -10,22 +13,32 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # Serialização JSON rápida e compressão das respostas
+    init_json(app)
+    init_compressao(app)
+
+    # Perfilador por amostragem sob demanda (por requisição ou por sinal)
+    init_perfil(app)
+
     # Configurar Logging
     if not os.path.exists('logs'):
         os.mkdir('logs')
 
     log_file = 'logs/chat_smart.log'
 
-    # Configuração para gerar um log por dia
-    file_handler = TimedRotatingFileHandler(log_file, when='midnight', interval=1, backupCount=10, encoding='utf-8')
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    # O logger é o mesmo para todas as instâncias do processo: o handler é adicionado uma vez
+    caminho_log = os.path.abspath(log_file)
+    if not any(getattr(h, 'baseFilename', None) == caminho_log for h in app.logger.handlers):
+        # Configuração para gerar um log por dia
+        file_handler = TimedRotatingFileHandler(log_file, when='midnight', interval=1, backupCount=10, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+        ))
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
 
     app.logger.setLevel(logging.INFO)
-    app.logger.info('ChatSQL Bot startup')
+    app.logger.info(f'ChatSQL Bot startup (pid {os.getpid()})')
 
     # Inicializar Limiter para Rate Limiting
     limiter = Limiter(
@@ -39,8 +52,46 @@ def create_app():
         from .services.openai_service import init_openai
         init_openai()
 
+        # Carregar o snapshot do schema do banco
+        from .services.schema_service import init_schema
+        init_schema(app)
+
+        # Carregar os exemplos validados usados como few-shot no prompt
+        from .services.exemplos_service import init_exemplos
+        init_exemplos(app)
+
+        # Disjuntores da OpenAI e do MySQL
+        from .services.disjuntor_service import init_disjuntores
+        init_disjuntores(app)
+
+        # Guardar o último resultado de cada sessão para os refinamentos
+        from .services.sessao_service import init_sessoes
+        init_sessoes(app)
+
         # Registrar Rotas
         from .routes import bp
         app.register_blueprint(bp)
 
-    return app
\ No newline at end of file
+        # A tabela pede uma página a cada rolagem: a rota tem limite próprio em vez do padrão
+        app.view_functions['main.pagina'] = limiter.limit(app.config['PAGINACAO_LIMITE'])(
+            app.view_functions['main.pagina']
+        )
+
+    return app
+
+
+def preaquecer(app):
+    """
+    Faz antes do fork dos workers o trabalho que, sem isso, ficaria para a primeira requisição.
+
+    Importa os clientes do MySQL e da OpenAI (carregados sob demanda pelos serviços) e
+    codifica o schema no formato do prompt, para que os workers herdem tudo pronto do
+    processo principal.
+    """
+    import mysql.connector
+    import openai
+    from .services.schema_service import codificar_schema
+
+    schema = app.extensions['schema']
+    for incluir_auditoria in (False, True):
+        codificar_schema(schema, app.config['SCHEMA_ENCODING'], incluir_auditoria=incluir_auditoria)
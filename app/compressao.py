@@ -0,0 +1,89 @@
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _compressor(codificacao, config):
+    """
+    Retorna as funções (comprimir parte, finalizar) da codificação escolhida.
+    """
+    if codificacao == "br":
+        compressor = brotli.Compressor(quality=config['COMPRESSAO_NIVEL_BROTLI'])
+        return compressor.process, compressor.finish
+    # wbits=31: formato gzip (cabeçalho e CRC), não o zlib puro
+    compressor = zlib.compressobj(config['COMPRESSAO_NIVEL_GZIP'], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _comprimir_partes(partes, comprimir, finalizar):
+    # Cada parte do corpo é comprimida assim que é produzida, sem montar o corpo inteiro
+    for parte in partes:
+        dados = comprimir(parte)
+        if dados:
+            yield dados
+    yield finalizar()
+
+
+def escolher_codificacao(aceitas, disponiveis):
+    """
+    Escolhe a codificação pelo Accept-Encoding do cliente, preferindo a ordem de `disponiveis`.
+
+    Returns:
+        str | None: "br", "gzip" ou None se o cliente não aceita nenhuma delas.
+    """
+    melhor = None
+    melhor_qualidade = 0
+    for codificacao in disponiveis:
+        qualidade = aceitas.quality(codificacao)
+        if qualidade > melhor_qualidade:
+            melhor, melhor_qualidade = codificacao, qualidade
+    return melhor
+
+
+def comprimir_resposta(response, config):
+    """
+    Comprime a resposta com gzip ou brotli quando o cliente aceita e ela vale a pena.
+
+    Respostas de tamanho conhecido abaixo de COMPRESSAO_MIN_BYTES não são comprimidas;
+    respostas em streaming são comprimidas parte a parte.
+    """
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in config['COMPRESSAO_TIPOS']
+    ):
+        return response
+
+    tamanho = response.content_length
+    if tamanho is not None and tamanho < config['COMPRESSAO_MIN_BYTES']:
+        return response
+
+    disponiveis = ("br", "gzip") if brotli is not None else ("gzip",)
+    response.vary.add('Accept-Encoding')
+    codificacao = escolher_codificacao(request.accept_encodings, disponiveis)
+    if codificacao is None:
+        return response
+
+    comprimir, finalizar = _compressor(codificacao, config)
+    response.response = _comprimir_partes(response.iter_encoded(), comprimir, finalizar)
+    response.headers.pop('Content-Length', None)
+    response.headers['Content-Encoding'] = codificacao
+    return response
+
+
+def init_compressao(app):
+    """
+    Registra a compressão das respostas (gzip/brotli negociado por Accept-Encoding).
+    """
+    if not app.config['COMPRESSAO']:
+        return
+
+    @app.after_request
+    def _comprimir(response):
+        return comprimir_resposta(response, app.config)
@@ -3,6 +3,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _niveis_llm(valor):
+    """
+    Converte "nome=modelo:prompt:temperatura,..." na lista de níveis de modelo.
+    """
+    niveis = []
+    for item in valor.split(','):
+        nome, definicao = item.strip().split('=', 1)
+        modelo, prompt, temperatura = definicao.split(':')
+        niveis.append({"nome": nome, "modelo": modelo, "prompt": prompt, "temperatura": float(temperatura)})
+    return niveis
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'you-will-never-guess')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -10,4 +21,77 @@ class Config:
     DB_PORT = os.getenv('DB_PORT')
     DB_USER = os.getenv('DB_USER')
     DB_PASSWORD = os.getenv('DB_PASSWORD')
-    DB_NAME = os.getenv('DB_NAME')
\ No newline at end of file
+    DB_NAME = os.getenv('DB_NAME')
+    # Snapshot versionado do schema lido do information_schema
+    SCHEMA_SNAPSHOT_PATH = os.getenv('SCHEMA_SNAPSHOT_PATH', 'instance/schema_snapshot.json')
+    SCHEMA_ATUALIZAR_NA_INICIALIZACAO = os.getenv('SCHEMA_ATUALIZAR_NA_INICIALIZACAO', 'true').lower() == 'true'
+    # Tabelas lidas do banco (separadas por vírgula); vazio mantém apenas as que já estão no snapshot
+    SCHEMA_TABELAS = [t.strip() for t in os.getenv('SCHEMA_TABELAS', '').split(',') if t.strip()]
+
+    # Codificação do schema no prompt: "compacto" (denso) ou "texto" (pseudo-JSON original)
+    SCHEMA_ENCODING = os.getenv('SCHEMA_ENCODING', 'compacto')
+
+    # Níveis de modelo, do mais barato ao mais caro, e as falhas que fazem escalar de nível
+    LLM_NIVEIS = _niveis_llm(os.getenv('LLM_NIVEIS', 'rapido=gpt-4o-mini:compacto:0,grande=gpt-4o:completo:1'))
+    LLM_ESCALAR_EM = os.getenv('LLM_ESCALAR_EM', 'extracao,validacao,banco').split(',')
+
+    # Prazo por requisição ao LLM e requisição duplicada (hedge) após o atraso configurado:
+    # segundos ("4.5"), percentil da latência observada ("p90") ou "0" para desligar
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')
+    LLM_PRAZO = float(os.getenv('LLM_PRAZO', '45'))
+    LLM_HEDGE_ATRASO = os.getenv('LLM_HEDGE_ATRASO', 'p90')
+    LLM_HEDGE_ATRASO_PADRAO = float(os.getenv('LLM_HEDGE_ATRASO_PADRAO', '8'))
+    LLM_HEDGE_MIN_AMOSTRAS = int(os.getenv('LLM_HEDGE_MIN_AMOSTRAS', '20'))
+    LLM_MAX_CONCORRENCIA = int(os.getenv('LLM_MAX_CONCORRENCIA', '16'))
+
+    # Pool de conexões MySQL e validação local (espelho SQLite do schema) antes de executar
+    DB_POOL_TAMANHO = int(os.getenv('DB_POOL_TAMANHO', '5'))
+    # Statements preparados mantidos por conexão (literais viram parâmetros); 0 desliga
+    DB_PREPARADAS_MAX = int(os.getenv('DB_PREPARADAS_MAX', '32'))
+    VALIDACAO_REJEITAR_SINTAXE = os.getenv('VALIDACAO_REJEITAR_SINTAXE', 'false').lower() == 'true'
+    # Prazo, em segundos, para conectar e para cada leitura do MySQL
+    DB_PRAZO = int(os.getenv('DB_PRAZO', '30'))
+
+    # Disjuntores da OpenAI e do MySQL: abrem após DISJUNTOR_FALHAS falhas seguidas e
+    # recusam as chamadas por DISJUNTOR_ESPERA segundos antes de testar a dependência
+    DISJUNTOR_FALHAS = int(os.getenv('DISJUNTOR_FALHAS', '5'))
+    DISJUNTOR_ESPERA = float(os.getenv('DISJUNTOR_ESPERA', '30'))
+    # Últimas respostas por pergunta, servidas (marcadas como desatualizadas) quando uma dependência cai
+    RESPOSTAS_CACHE_MB = int(os.getenv('RESPOSTAS_CACHE_MB', '32'))
+    RESPOSTAS_CACHE_TTL = int(os.getenv('RESPOSTAS_CACHE_TTL', '86400'))
+
+    # Exemplos pergunta -> SQL validados, recuperados por similaridade (BM25) para o prompt
+    EXEMPLOS_PATH = os.getenv('EXEMPLOS_PATH', 'instance/exemplos.json')
+    EXEMPLOS_TOP_K = int(os.getenv('EXEMPLOS_TOP_K', '3'))
+    EXEMPLOS_MAX = int(os.getenv('EXEMPLOS_MAX', '500'))
+    EXEMPLOS_TTL_DIAS = int(os.getenv('EXEMPLOS_TTL_DIAS', '90'))
+    # Segundos entre uma resposta que altera os exemplos e a gravação do arquivo
+    EXEMPLOS_SALVAR_INTERVALO = float(os.getenv('EXEMPLOS_SALVAR_INTERVALO', '30'))
+
+    # Último resultado de cada sessão, guardado para responder refinamentos ("agora só oficina") localmente
+    SESSAO_MEMORIA_MB = int(os.getenv('SESSAO_MEMORIA_MB', '64'))
+    SESSAO_TTL = int(os.getenv('SESSAO_TTL', '1800'))
+    SESSAO_MAX_LINHAS = int(os.getenv('SESSAO_MAX_LINHAS', '5000'))
+
+    # Paginação das respostas: linhas por página, validade do cursor (segundos) e limite da rota de páginas
+    PAGINA_TAMANHO = int(os.getenv('PAGINA_TAMANHO', '100'))
+    PAGINA_TOKEN_TTL = int(os.getenv('PAGINA_TOKEN_TTL', '3600'))
+    PAGINACAO_LIMITE = os.getenv('PAGINACAO_LIMITE', '600 per hour')
+
+    # Serialização JSON ("orjson" ou "padrao", o provider do Flask) e compressão das respostas
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    COMPRESSAO = os.getenv('COMPRESSAO', 'true').lower() == 'true'
+    COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', '1024'))
+    COMPRESSAO_NIVEL_GZIP = int(os.getenv('COMPRESSAO_NIVEL_GZIP', '6'))
+    COMPRESSAO_NIVEL_BROTLI = int(os.getenv('COMPRESSAO_NIVEL_BROTLI', '5'))
+    COMPRESSAO_TIPOS = os.getenv('COMPRESSAO_TIPOS', 'application/json,text/html').split(',')
+
+    # Perfilador por amostragem: GET /admin/perfil e o cabeçalho X-Perfil-Token exigem
+    # PERFIL_TOKEN (vazio desliga os dois); o sinal perfila o processo e salva em PERFIL_DIRETORIO
+    PERFIL_TOKEN = os.getenv('PERFIL_TOKEN', '')
+    PERFIL_INTERVALO = float(os.getenv('PERFIL_INTERVALO', '0.005'))
+    PERFIL_SEGUNDOS = float(os.getenv('PERFIL_SEGUNDOS', '10'))
+    PERFIL_MAX_SEGUNDOS = float(os.getenv('PERFIL_MAX_SEGUNDOS', '60'))
+    PERFIL_SINAL = os.getenv('PERFIL_SINAL', 'SIGUSR2')
+    PERFIL_SINAL_SEGUNDOS = float(os.getenv('PERFIL_SINAL_SEGUNDOS', '10'))
+    PERFIL_DIRETORIO = os.getenv('PERFIL_DIRETORIO', 'logs')
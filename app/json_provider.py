@@ -0,0 +1,63 @@
+import base64
+from datetime import timedelta
+from decimal import Decimal
+import orjson
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+# Chaves não-string (ex.: números de um GROUP BY) são aceitas como no json da biblioteca padrão
+OPCOES_ORJSON = orjson.OPT_NON_STR_KEYS
+
+
+def valor_json(valor):
+    """
+    Converte os tipos do MySQL que o orjson não serializa sozinho.
+
+    Decimal vira string para não perder precisão; TIME (timedelta) vira "H:MM:SS";
+    bytes são decodificados como UTF-8 ou, se forem binários, enviados em base64.
+    """
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, timedelta):
+        return str(valor)
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        try:
+            return bytes(valor).decode('utf-8')
+        except UnicodeDecodeError:
+            return base64.b64encode(bytes(valor)).decode('ascii')
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    Provider JSON do Flask baseado no orjson.
+
+    Datas e datetimes saem em ISO 8601 (o provider padrão usa o formato HTTP), e a
+    resposta é montada direto dos bytes, sem passar por str.
+    """
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=valor_json, option=OPCOES_ORJSON).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        corpo = orjson.dumps(obj, default=valor_json, option=OPCOES_ORJSON)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+
+PROVIDERS_JSON = {
+    "orjson": ORJSONProvider,
+    "padrao": DefaultJSONProvider,
+}
+
+
+def init_json(app):
+    """
+    Instala o provider JSON escolhido em JSON_PROVIDER ("orjson" ou "padrao").
+    """
+    app.json = PROVIDERS_JSON[app.config['JSON_PROVIDER']](app)
@@ -1,50 +1,512 @@
-import mysql.connector
-from mysql.connector import Error
-from flask import current_app
+import difflib
+import queue
 import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from flask import current_app
+from .disjuntor_service import obter_disjuntor
+from .metricas_service import incrementar, registrar
 
-def executar_query(query, params=None):
+UNSAFE_PATTERNS = [
+    r'\bDELETE\b',
+    r'\bUPDATE\b',
+    r'\bDROP\b',
+    r'\bINSERT\b',
+    r'\bALTER\b',
+    r'\bTRUNCATE\b',
+    r'\bGRANT\b',
+    r'\bREVOKE\b',
+]
+
+# Reescritas de construções do MySQL que o SQLite do espelho não entende
+NORMALIZACOES_MYSQL = [
+    # DATE_SUB(x, INTERVAL 1 MONTH) -> DATE_SUB(x, (1))
+    (re.compile(r"\bINTERVAL\s+('[^']*'|[\w.]+|\([^()]*\))\s+\w+\b", re.IGNORECASE), r"(\1)"),
+    # TIMESTAMPDIFF(MONTH, a, b) -> TIMESTAMPDIFF('MONTH', a, b)
+    (re.compile(r"\b(TIMESTAMPDIFF|TIMESTAMPADD)\s*\(\s*(\w+)\s*,", re.IGNORECASE), r"\1('\2',"),
+    # EXTRACT(YEAR FROM x) -> EXTRACT('YEAR', x)
+    (re.compile(r"\bEXTRACT\s*\(\s*(\w+)\s+FROM\b", re.IGNORECASE), r"EXTRACT('\1',"),
+    # GROUP_CONCAT(DISTINCT x ORDER BY x SEPARATOR ', ') -> GROUP_CONCAT(DISTINCT x)
+    (re.compile(r"(\bGROUP_CONCAT\s*\((?:[^()]|\([^()]*\))*?)\s+ORDER\s+BY\s+(?:[^()]|\([^()]*\))*?(?=\s+SEPARATOR\b|\))", re.IGNORECASE), r"\1"),
+    (re.compile(r"\s+SEPARATOR\s+'(?:[^']|'')*'", re.IGNORECASE), ""),
+    (re.compile(r"\bWITH\s+ROLLUP\b", re.IGNORECASE), ""),
+    (re.compile(r"\bDIV\b", re.IGNORECASE), "/"),
+    # TIMESTAMP '2024-01-01 00:00:00' -> '2024-01-01 00:00:00'
+    (re.compile(r"\b(?:DATE|TIME|TIMESTAMP)\s+('(?:[^']|'')*')", re.IGNORECASE), r"\1"),
+    # ISNULL(x) -> mysql_isnull(x): no SQLite, ISNULL é só o operador pós-fixado
+    (re.compile(r"\bISNULL\s*\(", re.IGNORECASE), "mysql_isnull("),
+    # Comparação segura com NULL
+    (re.compile(r"<=>"), " IS "),
+    # Modificadores do SELECT e dicas de otimização
+    (re.compile(r"\bSELECT((?:\s+(?:STRAIGHT_JOIN|HIGH_PRIORITY|SQL_NO_CACHE|SQL_CALC_FOUND_ROWS|SQL_SMALL_RESULT|SQL_BIG_RESULT|SQL_BUFFER_RESULT))+)\b", re.IGNORECASE), "SELECT"),
+    (re.compile(r"\bSTRAIGHT_JOIN\b", re.IGNORECASE), "JOIN"),
+    (re.compile(r"\b(?:FORCE|USE|IGNORE)\s+(?:INDEX|KEY)(?:\s+FOR\s+(?:JOIN|ORDER\s+BY|GROUP\s+BY))?\s*\([^()]*\)", re.IGNORECASE), ""),
+    # x = ANY (SELECT ...) -> x = (SELECT ...)
+    (re.compile(r"(=|<>|!=|<=|>=|<|>)\s*(?:ANY|SOME|ALL)\s*\(", re.IGNORECASE), r"\1 ("),
+    # TRIM(LEADING 'x' FROM c) -> TRIM(c)
+    (re.compile(r"\bTRIM\s*\(\s*(?:(?:LEADING|TRAILING|BOTH)\s+)?(?:'(?:[^']|'')*'\s*|[\w.]+\s+)?FROM\s+", re.IGNORECASE), "TRIM("),
+    # CONVERT(x, CHAR) / CONVERT(x USING utf8mb4) -> (x)
+    (re.compile(r"\bCONVERT\s*\(((?:[^()]|\([^()]*\))*?)(?:,\s*\w+(?:\s*\([^()]*\))?(?:\s+\w+)?|\s+USING\s+\w+)\s*\)", re.IGNORECASE), r"(\1)"),
+    # MATCH (a, b) AGAINST ('x' IN BOOLEAN MODE) -> mysql_match(a, b, 'x')
+    (re.compile(r"\bMATCH\s*\(([^()]*)\)\s*AGAINST\s*\(\s*('(?:[^']|'')*')[^()]*\)", re.IGNORECASE), r"mysql_match(\1, \2)"),
+    # POSITION('a' IN s.nome) -> INSTR(s.nome, 'a'); senão o SQLite lê "IN s.nome" como tabela
+    (re.compile(r"\bPOSITION\s*\(\s*('(?:[^']|'')*'|[\w.]+)\s+IN\s+([\w.]+)\s*\)", re.IGNORECASE), r"INSTR(\2, \1)"),
+]
+
+# Nome de tabela (e alias opcional) após FROM/JOIN
+PADRAO_TABELA_ALIAS = re.compile(
+    r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(?!(?:ON|USING|WHERE|JOIN|LEFT|RIGHT|INNER|OUTER|CROSS|"
+    r"NATURAL|GROUP|ORDER|HAVING|LIMIT|UNION)\b)(\w+)`?)?",
+    re.IGNORECASE,
+)
+
+# Tokens relevantes para extrair literais; o resto (operadores, espaços) é copiado como está
+PADRAO_TOKEN_SQL = re.compile(
+    r"(?P<string>'(?:[^'\\]|\\.|'')*')"
+    r"|(?P<opaco>\"(?:[^\"\\]|\\.|\"\")*\"|`[^`]*`|--[^\n]*|#[^\n]*|/\*.*?\*/)"
+    r"|(?P<numero>\d+(?:\.\d+)?(?![\w$.]))"
+    r"|(?P<palavra>[\w$]+)"
+    r"|(?P<abre>\()"
+    r"|(?P<fecha>\))",
+    re.DOTALL,
+)
+
+# Palavras que mudam a cláusula corrente; literais só viram parâmetros em WHERE, HAVING e ON
+CLAUSULAS_SQL = {
+    "SELECT": "select", "UNION": "select", "FROM": "from", "JOIN": "from", "STRAIGHT_JOIN": "from",
+    "USING": "from", "ON": "on", "WHERE": "where", "GROUP": "group", "PARTITION": "group",
+    "HAVING": "having", "ORDER": "order", "LIMIT": "limit", "OFFSET": "limit", "WINDOW": "window",
+}
+CLAUSULAS_PARAMETRIZAVEIS = {"where", "having", "on"}
+
+# Literais que o MySQL exige constantes: DATE '...', LIKE ... ESCAPE '!', SEPARATOR ', '
+PALAVRAS_ANTES_DE_CONSTANTE = {"DATE", "TIME", "TIMESTAMP", "ESCAPE", "SEPARATOR"}
+
+# Tipos cujos argumentos são parte da sintaxe, como em CAST(x AS DECIMAL(10, 2))
+TIPOS_COM_TAMANHO = {"DECIMAL", "DEC", "NUMERIC", "CHAR", "VARCHAR", "BINARY", "VARBINARY", "DATETIME", "TIME", "TIMESTAMP", "FLOAT", "DOUBLE"}
+
+# Limite de reescritas (funções registradas, colunas de tabelas parciais) por validação
+MAX_AJUSTES_VALIDACAO = 30
+
+# ER_QUERY_TIMEOUT: a query passou do max_execution_time do servidor
+ERRNO_PRAZO_EXCEDIDO = 3024
+
+
+class BancoIndisponivel(Exception):
+    """
+    O MySQL não respondeu (conexão, prazo excedido) ou o disjuntor dele está aberto.
+
+    Erros da própria query não são indisponibilidade: continuam voltando como mensagem.
+    """
+
+_espelho_local = threading.local()
+
+def conectar():
+    """
+    Abre uma conexão com o MySQL usando as configurações da aplicação.
+
+    Returns:
+        MySQLConnection: A conexão aberta.
+    """
+    # O conector do MySQL é importado no primeiro uso, não na inicialização da aplicação
+    import mysql.connector
+
+    return mysql.connector.connect(
+        host=current_app.config['DB_HOST'],
+        port=current_app.config['DB_PORT'],
+        database=current_app.config['DB_NAME'],
+        user=current_app.config['DB_USER'],
+        password=current_app.config['DB_PASSWORD'],
+        connection_timeout=current_app.config['DB_PRAZO'],
+    )
+
+def validar_seguranca(query):
+    """
+    Verifica se a query é um SELECT sem comandos de escrita.
+
+    Args:
+        query (str): A query SQL.
+
+    Returns:
+        str | None: A mensagem de erro, ou None se a query for permitida.
+    """
     # Apenas permitir queries SELECT para segurança
     if not re.match(r'^SELECT\b', query, re.IGNORECASE):
         return "Somente queries SELECT são permitidas para segurança."
 
     # Verificar se a query contém comandos indesejados
     # Como DELETE, UPDATE, DROP, etc.
-    unsafe_patterns = [
-        r'\bDELETE\b',
-        r'\bUPDATE\b',
-        r'\bDROP\b',
-        r'\bINSERT\b',
-        r'\bALTER\b',
-        r'\bTRUNCATE\b',
-        r'\bGRANT\b',
-        r'\bREVOKE\b',
-    ]
-
-    for pattern in unsafe_patterns:
+    for pattern in UNSAFE_PATTERNS:
         if re.search(pattern, query, re.IGNORECASE):
             return f"Comando SQL não permitido detectado na query: '{pattern.strip(r'\b')}'"
-    
-    # Inicializar a variável antes do try
+
+    return None
+
+def parametrizar_query(query):
+    """
+    Extrai os literais de WHERE, HAVING e ON para placeholders %s.
+
+    Perguntas que só mudam datas ou nomes passam a gerar o mesmo template, que pode
+    ser preparado uma vez no servidor. O SELECT, GROUP BY, ORDER BY e LIMIT ficam
+    como estão (nomes de colunas e posições dependem dos literais), assim como
+    strings com barra invertida e literais que o MySQL exige constantes.
+
+    Args:
+        query (str): A query SQL gerada.
+
+    Returns:
+        tuple: (template com %s, tupla de parâmetros na ordem dos placeholders)
+    """
+    partes = []
+    params = []
+    clausula = None
+    pilha = []
+    anterior = None
+    posicao = 0
+    for match in PADRAO_TOKEN_SQL.finditer(query):
+        tipo, texto = match.lastgroup, match.group()
+        intervalo = query[posicao:match.start()]
+        partes.append(intervalo)
+        posicao = match.end()
+        palavra_anterior = anterior.upper() if anterior and not intervalo.strip() else None
+
+        if tipo == "palavra":
+            clausula = CLAUSULAS_SQL.get(texto.upper(), clausula)
+        elif tipo == "abre":
+            pilha.append(clausula)
+            if palavra_anterior in TIPOS_COM_TAMANHO:
+                clausula = "tipo"
+        elif tipo == "fecha":
+            clausula = pilha.pop() if pilha else clausula
+        elif clausula in CLAUSULAS_PARAMETRIZAVEIS and palavra_anterior not in PALAVRAS_ANTES_DE_CONSTANTE:
+            if tipo == "numero":
+                params.append(Decimal(texto) if '.' in texto else int(texto))
+                texto = "%s"
+            elif (
+                tipo == "string"
+                and '\\' not in texto
+                # _utf8mb4'x', N'x' e o caminho JSON de col->'$.x' também precisam ser constantes
+                and not (intervalo == "" and anterior)
+                and not intervalo.rstrip().endswith(('->', '->>'))
+            ):
+                params.append(texto[1:-1].replace("''", "'"))
+                texto = "%s"
+
+        partes.append(texto)
+        anterior = texto if tipo == "palavra" else None
+
+    partes.append(query[posicao:])
+    return "".join(partes), tuple(params)
+
+class PoolConexoes:
+    """
+    Pool simples de conexões MySQL reaproveitadas entre requisições.
+
+    As conexões são criadas sob demanda (no processo que as usa, o que mantém o
+    pool seguro após um fork) e devolvidas ao fim de cada query.
+
+    Cada conexão guarda até `max_preparadas` cursores com statements preparados no
+    servidor, por template de query, descartando o menos usado recentemente.
+    """
+    def __init__(self, criar, tamanho, max_preparadas=0):
+        self._criar = criar
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+        self._max_preparadas = max_preparadas
+        self._preparadas = {}
+        self._lock = threading.Lock()
+
+    def obter(self):
+        while True:
+            try:
+                connection = self._livres.get_nowait()
+            except queue.Empty:
+                return self._criar()
+            if connection.is_connected():
+                return connection
+            self._descartar_preparadas(connection)
+
+    def devolver(self, connection):
+        if not connection.is_connected():
+            self._descartar_preparadas(connection)
+            return
+        try:
+            self._livres.put_nowait(connection)
+        except queue.Full:
+            self._descartar_preparadas(connection)
+            connection.close()
+
+    def cursor_preparado(self, connection, template):
+        """
+        Retorna o cursor que já preparou o template nesta conexão, ou prepara um novo.
+
+        O conector só reaproveita o statement se receber o mesmo objeto str que o
+        preparou, por isso o template guardado é devolvido para ser executado.
+
+        Returns:
+            tuple: (cursor, template a executar, se o statement foi reaproveitado)
+        """
+        with self._lock:
+            cursores = self._preparadas.setdefault(connection, OrderedDict())
+        # Uma conexão só é usada por uma requisição por vez: o cache dela dispensa lock
+        if template in cursores:
+            cursores.move_to_end(template)
+            cursor, preparado = cursores[template]
+            return cursor, preparado, True
+
+        cursor = connection.cursor(prepared=True, dictionary=True)
+        cursores[template] = (cursor, template)
+        while len(cursores) > self._max_preparadas:
+            _, (antigo, _) = cursores.popitem(last=False)
+            self._fechar_cursor(antigo)
+        return cursor, template, False
+
+    def descartar_cursor(self, connection, template):
+        """
+        Remove o cursor preparado do template, por exemplo após um erro na execução.
+        """
+        cursores = self._preparadas.get(connection, {})
+        cursor, _ = cursores.pop(template, (None, None))
+        if cursor is not None:
+            self._fechar_cursor(cursor)
+
+    def _descartar_preparadas(self, connection):
+        with self._lock:
+            cursores = self._preparadas.pop(connection, {})
+        for cursor, _ in cursores.values():
+            self._fechar_cursor(cursor)
+
+    @staticmethod
+    def _fechar_cursor(cursor):
+        from mysql.connector import Error
+
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+def obter_pool():
+    """
+    Retorna o pool de conexões da aplicação, criando-o no primeiro uso.
+    """
+    pool = current_app.extensions.get('pool_mysql')
+    if pool is None:
+        pool = current_app.extensions['pool_mysql'] = PoolConexoes(
+            conectar, current_app.config['DB_POOL_TAMANHO'], current_app.config['DB_PREPARADAS_MAX']
+        )
+    return pool
+
+def _criar_espelho(schema):
+    """
+    Cria um banco SQLite em memória com as tabelas e colunas do schema, sem dados.
+
+    Tabelas citadas apenas em FKs entram como "parciais" (somente `id`), e suas
+    colunas são aceitas durante a validação.
+    """
+    conexao = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False)
+    tabelas = schema['tabelas']
+    parciais = set()
+    for nome, info in tabelas.items():
+        colunas = ", ".join(f'"{coluna}"' for coluna, _ in info['colunas']) or '"id"'
+        conexao.execute(f'CREATE TABLE "{nome}" ({colunas})')
+    for info in tabelas.values():
+        for referencia in info['fks'].values():
+            tabela_ref = referencia.split('.', 1)[0]
+            if tabela_ref not in tabelas and tabela_ref not in parciais:
+                conexao.execute(f'CREATE TABLE "{tabela_ref}" ("id")')
+                parciais.add(tabela_ref)
+
+    # Funções do MySQL viram funções vazias; só importa que o nome exista
+    conexao.create_function("regexp", 2, lambda *args: None)
+    return {"schema": schema, "conexao": conexao, "parciais": parciais}
+
+def _obter_espelho():
+    # Um espelho por thread; recriado quando o snapshot do schema muda
+    schema = current_app.extensions['schema']
+    espelho = getattr(_espelho_local, 'espelho', None)
+    if espelho is None or espelho['schema'] is not schema:
+        espelho = _espelho_local.espelho = _criar_espelho(schema)
+    return espelho
+
+def normalizar_para_sqlite(query):
+    """
+    Reescreve construções específicas do MySQL para que o SQLite consiga compilar a query.
+    """
+    for padrao, substituicao in NORMALIZACOES_MYSQL:
+        query = padrao.sub(substituicao, query)
+    return query
+
+def _erro_validacao(tipo, mensagem, **detalhes):
+    return {"tipo": tipo, "mensagem": mensagem, **detalhes}
+
+def _traduzir_erro_sqlite(mensagem, espelho, aliases):
+    tabelas = espelho['schema']['tabelas']
+
+    match = re.match(r'no such table: (?:\w+\.)?(\w+)', mensagem)
+    # Só é tabela desconhecida se vier de um FROM/JOIN; senão o SQLite leu errado a construção
+    if match and match.group(1).lower() in aliases:
+        tabela = match.group(1)
+        return _erro_validacao(
+            "tabela_desconhecida", f"Tabela desconhecida: {tabela}", identificador=tabela,
+            sugestoes=difflib.get_close_matches(tabela, list(tabelas), n=3),
+        )
+
+    match = re.match(r'no such column: (?:(\w+)\.)?(\w+)', mensagem)
+    if match:
+        alias, coluna = match.groups()
+        tabela = aliases.get(alias.lower()) if alias else None
+        if tabela in tabelas:
+            candidatas = [c for c, _ in tabelas[tabela]['colunas']]
+        else:
+            candidatas = sorted({c for nome in aliases.values() if nome in tabelas for c, _ in tabelas[nome]['colunas']})
+        identificador = f"{alias}.{coluna}" if alias else coluna
+        return _erro_validacao(
+            "coluna_desconhecida", f"Coluna desconhecida: {identificador}", identificador=identificador,
+            tabela=tabela, sugestoes=difflib.get_close_matches(coluna, candidatas, n=3),
+        )
+
+    match = re.match(r'ambiguous column name: (\S+)', mensagem)
+    if match:
+        return _erro_validacao(
+            "coluna_ambigua", f"Coluna ambígua, qualifique com a tabela: {match.group(1)}",
+            identificador=match.group(1),
+        )
+
+    return _erro_validacao("sintaxe", f"Erro de sintaxe: {mensagem}")
+
+def validar_query(query):
+    """
+    Compila a query em um espelho SQLite do schema (sem dados), sem acessar o MySQL.
+
+    Verifica tabelas, colunas (inclusive nos JOINs) e sintaxe em microssegundos,
+    antes de ocupar uma conexão do pool.
+
+    Args:
+        query (str): A query SQL gerada.
+
+    Returns:
+        dict | None: None se a query compilar; senão um dicionário com "tipo"
+            (tabela_desconhecida, coluna_desconhecida, coluna_ambigua, sintaxe),
+            "mensagem" e detalhes como "identificador" e "sugestoes", para o prompt de correção.
+    """
+    inicio = time.perf_counter()
+    espelho = _obter_espelho()
+    conexao = espelho['conexao']
+    sql = normalizar_para_sqlite(query.strip().rstrip(';'))
+    # Os aliases vêm da query normalizada: "FROM os FORCE INDEX (...)" não tem alias FORCE
+    aliases = {}
+    for tabela, alias in PADRAO_TABELA_ALIAS.findall(sql):
+        aliases[tabela.lower()] = tabela
+        if alias:
+            aliases[alias.lower()] = tabela
+    erro = None
+    conexao.execute("BEGIN")
+    try:
+        for _ in range(MAX_AJUSTES_VALIDACAO):
+            try:
+                conexao.execute(f"EXPLAIN {sql}")
+                break
+            except sqlite3.ProgrammingError as e:
+                erro = _erro_validacao("sintaxe", f"Erro de sintaxe: {e}")
+                break
+            except sqlite3.OperationalError as e:
+                mensagem = str(e)
+
+                match = re.match(r'no such function: (\w+)', mensagem)
+                if match:
+                    conexao.create_function(match.group(1), -1, lambda *args: None)
+                    continue
+
+                # Colunas de tabelas conhecidas só por FK são aceitas (dentro da transação)
+                match = re.match(r'no such column: (?:(\w+)\.)?(\w+)', mensagem)
+                if match:
+                    alias, coluna = match.groups()
+                    candidatas = [aliases.get(alias.lower())] if alias else list(aliases.values())
+                    parcial = next((t for t in candidatas if t in espelho['parciais']), None)
+                    if parcial:
+                        conexao.execute(f'ALTER TABLE "{parcial}" ADD COLUMN "{coluna}"')
+                        continue
+
+                erro = _traduzir_erro_sqlite(mensagem, espelho, aliases)
+                break
+    finally:
+        conexao.execute("ROLLBACK")
+
+    if erro and erro['tipo'] == "sintaxe" and not current_app.config['VALIDACAO_REJEITAR_SINTAXE']:
+        current_app.logger.info(f"Validação local ignorou erro de sintaxe: {erro['mensagem']}")
+        erro = None
+
+    registrar("validacao", "espelho", time.perf_counter() - inicio, erro is None, erro['tipo'] if erro else None)
+    return erro
+
+def executar_query(query, params=None):
+    """
+    Executa um SELECT em uma conexão do pool.
+
+    Com DB_PREPARADAS_MAX > 0 e sem `params`, os literais da query são extraídos
+    (parametrizar_query) e o template é executado como statement preparado,
+    reaproveitado pela conexão nas próximas perguntas com o mesmo formato.
+
+    Args:
+        query (str): A query SQL.
+        params (tuple, optional): Parâmetros para os placeholders %s da query.
+
+    Returns:
+        list | str: As linhas como dicionários, ou a mensagem de erro da query.
+
+    Raises:
+        BancoIndisponivel: Se o disjuntor do MySQL estiver aberto ou se o banco não
+            responder; essas falhas contam para o disjuntor.
+    """
+    from mysql.connector import Error, InterfaceError, OperationalError
+
+    erro = validar_seguranca(query)
+    if erro:
+        return erro
+
+    preparar = current_app.config['DB_PREPARADAS_MAX'] > 0
+    if preparar and params is None:
+        query, params = parametrizar_query(query)
+
+    # Inicializar as variáveis antes do try
     connection = None
+    cursor = None
+    pool = obter_pool()
+    disjuntor = obter_disjuntor("mysql")
+    if not disjuntor.permitir():
+        raise BancoIndisponivel("O banco de dados está indisponível (disjuntor aberto)")
+    inicio = time.perf_counter()
 
     try:
-        connection = mysql.connector.connect(
-            host=current_app.config['DB_HOST'],
-            port=current_app.config['DB_PORT'],
-            database=current_app.config['DB_NAME'],
-            user=current_app.config['DB_USER'],
-            password=current_app.config['DB_PASSWORD']
-        )
-        if connection.is_connected():
+        connection = pool.obter()
+        if not connection.is_connected():
+            raise InterfaceError("Conexão com o banco perdida")
+        if preparar:
+            cursor, query, reaproveitado = pool.cursor_preparado(connection, query)
+            incrementar("banco", "query", "preparadas_reaproveitadas" if reaproveitado else "preparadas_novas")
+        else:
             cursor = connection.cursor(dictionary=True)
-            cursor.execute(query, params)
-            resultados = cursor.fetchall()
-            return resultados
+        cursor.execute(query, params)
+        resultados = cursor.fetchall()
+        registrar("banco", "query", time.perf_counter() - inicio, True)
+        disjuntor.sucesso()
+        return resultados
     except Error as e:
+        indisponivel = isinstance(e, (InterfaceError, OperationalError)) or e.errno == ERRNO_PRAZO_EXCEDIDO
+        registrar("banco", "query", time.perf_counter() - inicio, False, "indisponivel" if indisponivel else "erro")
+        if preparar and cursor is not None:
+            pool.descartar_cursor(connection, query)
         current_app.logger.error(f"Erro ao executar a query: {e}")
+        if indisponivel:
+            disjuntor.falha()
+            raise BancoIndisponivel(f"O banco de dados não respondeu: {e}") from e
+        # O banco respondeu: o erro é da query
+        disjuntor.sucesso()
         return f"Erro ao executar a query: {str(e)}"
     finally:
-        if connection.is_connected():
+        if cursor is not None and not preparar:
             cursor.close()
-            connection.close()
\ No newline at end of file
+        if connection is not None:
+            pool.devolver(connection)
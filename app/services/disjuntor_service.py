@@ -0,0 +1,117 @@
+import threading
+import time
+from flask import current_app
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Dependências externas protegidas por disjuntor
+DEPENDENCIAS = ("openai", "mysql")
+
+
+class Disjuntor:
+    """
+    Circuit breaker de uma dependência externa.
+
+    Fechado, deixa passar todas as chamadas. Depois de `limite_falhas` falhas seguidas,
+    abre e recusa as chamadas por `espera` segundos, para que as requisições falhem na
+    hora em vez de se acumularem esperando a dependência. Passada a espera, fica
+    meio-aberto e deixa passar uma única chamada de teste: o sucesso fecha o circuito
+    e a falha o reabre.
+    """
+    def __init__(self, nome, limite_falhas, espera):
+        self.nome = nome
+        self.limite_falhas = limite_falhas
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._estado = FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_em = None
+        self._teste_em = None
+        self._aberturas = 0
+        self._recusadas = 0
+
+    def _atualizar(self, agora):
+        if self._estado == ABERTO and agora - self._aberto_em >= self.espera:
+            self._estado = MEIO_ABERTO
+            self._teste_em = None
+
+    @property
+    def aberto(self):
+        """
+        Se as chamadas estão sendo recusadas agora (sem consumir a chamada de teste).
+        """
+        with self._lock:
+            self._atualizar(time.monotonic())
+            return self._estado == ABERTO
+
+    def permitir(self):
+        """
+        Retorna se a chamada pode seguir. No estado meio-aberto, só a chamada de teste segue.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            self._atualizar(agora)
+            if self._estado == FECHADO:
+                return True
+            # Um teste sem resposta por mais que a espera não bloqueia o circuito para sempre
+            if self._estado == MEIO_ABERTO and (self._teste_em is None or agora - self._teste_em >= self.espera):
+                self._teste_em = agora
+                return True
+            self._recusadas += 1
+            return False
+
+    def sucesso(self):
+        with self._lock:
+            self._estado = FECHADO
+            self._falhas_seguidas = 0
+            self._teste_em = None
+
+    def falha(self):
+        with self._lock:
+            self._falhas_seguidas += 1
+            if self._estado == MEIO_ABERTO or (
+                self._estado == FECHADO and self._falhas_seguidas >= self.limite_falhas
+            ):
+                self._estado = ABERTO
+                self._aberto_em = time.monotonic()
+                self._aberturas += 1
+
+    def resumo(self):
+        """
+        Retorna o estado do disjuntor para as métricas.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            self._atualizar(agora)
+            return {
+                "estado": self._estado,
+                "falhas_seguidas": self._falhas_seguidas,
+                "aberturas": self._aberturas,
+                "recusadas": self._recusadas,
+                "reabre_em_s": (
+                    round(self.espera - (agora - self._aberto_em), 1) if self._estado == ABERTO else None
+                ),
+            }
+
+
+def init_disjuntores(app):
+    """
+    Cria um disjuntor por dependência externa com os limites da configuração.
+    """
+    app.extensions['disjuntores'] = {
+        nome: Disjuntor(nome, app.config['DISJUNTOR_FALHAS'], app.config['DISJUNTOR_ESPERA'])
+        for nome in DEPENDENCIAS
+    }
+
+
+def obter_disjuntor(nome):
+    return current_app.extensions['disjuntores'][nome]
+
+
+def estados_disjuntores():
+    """
+    Retorna o resumo de todos os disjuntores, por dependência.
+    """
+    return {nome: disjuntor.resumo() for nome, disjuntor in current_app.extensions['disjuntores'].items()}
@@ -0,0 +1,293 @@
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter
+from flask import current_app
+
+# Exemplos validados extraídos do histórico de logs, usados quando não há arquivo salvo
+CAMINHO_SEMENTE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exemplos_semente.json')
+
+STOPWORDS = {
+    "a", "as", "o", "os", "um", "uma", "uns", "umas", "de", "da", "das", "do", "dos", "e", "em", "no",
+    "na", "nos", "nas", "por", "para", "pelo", "pela", "com", "que", "qual", "quais", "quanto",
+    "quantos", "quantas", "me", "mostre", "liste", "gere", "relatorio", "se", "ao", "aos", "ou",
+}
+
+# Parâmetros do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Serializa as gravações do arquivo de exemplos entre as threads do processo
+_lock_gravacao = threading.Lock()
+
+
+def tokenizar(texto):
+    """
+    Normaliza o texto para o índice lexical: sem acentos, minúsculo, sem stopwords e
+    com stemming por prefixo (5 letras), que aproxima "vendedor"/"vendedores".
+    """
+    texto = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
+    return [token[:5] for token in re.findall(r'\w+', texto) if token not in STOPWORDS]
+
+
+class RepositorioExemplos:
+    """
+    Repositório limitado de pares pergunta -> SQL validados, com índice BM25 em memória.
+
+    Guarda quantas vezes cada exemplo foi usado no prompt e quantas dessas vezes a
+    resposta teve sucesso. Ao passar de `tamanho_maximo`, remove primeiro os exemplos
+    sem uso há mais de `ttl` segundos e depois os de pior saldo de sucesso.
+    """
+    def __init__(self, tamanho_maximo, ttl):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._exemplos = {}
+        self._por_chave = {}
+        self._tokens = {}
+        self._tamanhos = {}
+        self._indice = {}
+        self._proximo_id = 1
+        self._total_tokens = 0
+        self._alterado = False
+
+    def __len__(self):
+        return len(self._exemplos)
+
+    def _indexar(self, id_exemplo, pergunta):
+        frequencias = Counter(tokenizar(pergunta))
+        self._tokens[id_exemplo] = frequencias
+        self._tamanhos[id_exemplo] = sum(frequencias.values())
+        self._total_tokens += self._tamanhos[id_exemplo]
+        for token in frequencias:
+            self._indice.setdefault(token, set()).add(id_exemplo)
+
+    def _remover(self, id_exemplo):
+        frequencias = self._tokens.pop(id_exemplo)
+        self._total_tokens -= self._tamanhos.pop(id_exemplo)
+        for token in frequencias:
+            ids = self._indice[token]
+            ids.discard(id_exemplo)
+            if not ids:
+                del self._indice[token]
+        del self._por_chave[self._exemplos.pop(id_exemplo)['chave']]
+
+    def _despejar(self):
+        agora = time.time()
+        if len(self._exemplos) > self.tamanho_maximo:
+            antigos = [i for i, e in self._exemplos.items() if agora - e['ultimo_uso'] > self.ttl]
+            for id_exemplo in antigos[:len(self._exemplos) - self.tamanho_maximo]:
+                self._remover(id_exemplo)
+
+        excedentes = len(self._exemplos) - self.tamanho_maximo
+        if excedentes > 0:
+            piores = heapq.nsmallest(
+                excedentes,
+                self._exemplos.items(),
+                key=lambda item: (item[1]['sucessos'] - item[1]['falhas'], item[1]['ultimo_uso']),
+            )
+            for id_exemplo, _ in piores:
+                self._remover(id_exemplo)
+
+    def adicionar(self, pergunta, query, sucessos=0, falhas=0, ultimo_uso=None):
+        """
+        Adiciona um par pergunta -> SQL validado. Se a pergunta já existe, atualiza a query.
+
+        Returns:
+            int: O id do exemplo.
+        """
+        chave = " ".join(tokenizar(pergunta))
+        with self._lock:
+            id_exemplo = self._por_chave.get(chave)
+            if id_exemplo is not None:
+                exemplo = self._exemplos[id_exemplo]
+                exemplo['query'] = query
+                exemplo['ultimo_uso'] = time.time()
+                return id_exemplo
+
+            id_exemplo = self._proximo_id
+            self._proximo_id += 1
+            self._exemplos[id_exemplo] = {
+                "id": id_exemplo,
+                "pergunta": pergunta,
+                "query": query,
+                "chave": chave,
+                "sucessos": sucessos,
+                "falhas": falhas,
+                "ultimo_uso": ultimo_uso or time.time(),
+            }
+            self._por_chave[chave] = id_exemplo
+            self._indexar(id_exemplo, pergunta)
+            self._despejar()
+            return id_exemplo
+
+    def buscar(self, pergunta, k):
+        """
+        Retorna os k exemplos mais parecidos com a pergunta (BM25), do mais ao menos similar.
+        """
+        tokens = set(tokenizar(pergunta))
+        with self._lock:
+            total = len(self._exemplos)
+            if not total or not tokens:
+                return []
+            media = self._total_tokens / total
+            pontuacoes = Counter()
+            for token in tokens:
+                ids = self._indice.get(token)
+                if not ids:
+                    continue
+                idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+                for id_exemplo in ids:
+                    tf = self._tokens[id_exemplo][token]
+                    pontuacoes[id_exemplo] += idf * tf * (BM25_K1 + 1) / (
+                        tf + BM25_K1 * (1 - BM25_B + BM25_B * self._tamanhos[id_exemplo] / media)
+                    )
+            melhores = heapq.nlargest(k, pontuacoes.items(), key=lambda item: item[1])
+            return [dict(self._exemplos[id_exemplo]) for id_exemplo, _ in melhores]
+
+    def registrar_resultado(self, ids, sucesso):
+        """
+        Registra se a resposta gerada com estes exemplos no prompt teve sucesso.
+        """
+        with self._lock:
+            for id_exemplo in ids:
+                exemplo = self._exemplos.get(id_exemplo)
+                if exemplo is None:
+                    continue
+                exemplo['sucessos' if sucesso else 'falhas'] += 1
+                exemplo['ultimo_uso'] = time.time()
+
+    def marcar_alterado(self):
+        """
+        Marca que há alterações a gravar.
+
+        Returns:
+            bool: True se não havia alterações pendentes (a gravação deve ser agendada).
+        """
+        with self._lock:
+            pendente, self._alterado = self._alterado, True
+            return not pendente
+
+    def consumir_alteracao(self):
+        """
+        Retorna se havia alterações pendentes, limpando a marca.
+        """
+        with self._lock:
+            pendente, self._alterado = self._alterado, False
+            return pendente
+
+    def para_lista(self):
+        with self._lock:
+            return [
+                {campo: valor for campo, valor in exemplo.items() if campo not in ('id', 'chave')}
+                for exemplo in self._exemplos.values()
+            ]
+
+
+def carregar_exemplos(repositorio, caminho):
+    """
+    Carrega exemplos de um arquivo JSON (lista de objetos com "pergunta" e "query").
+    """
+    with open(caminho, encoding='utf-8') as arquivo:
+        for exemplo in json.load(arquivo):
+            repositorio.adicionar(
+                exemplo['pergunta'],
+                exemplo['query'],
+                sucessos=exemplo.get('sucessos', 0),
+                falhas=exemplo.get('falhas', 0),
+                ultimo_uso=exemplo.get('ultimo_uso'),
+            )
+
+
+def salvar_exemplos(repositorio, caminho):
+    """
+    Salva os exemplos de forma atômica (escreve em um arquivo temporário único e renomeia).
+
+    Gravações concorrentes do mesmo processo são serializadas. Entre workers, vale a
+    última gravação: cada um grava a semente mais os exemplos que ele mesmo aprendeu.
+    """
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    exemplos = repositorio.para_lista()
+    with _lock_gravacao:
+        descritor, temporario = tempfile.mkstemp(
+            dir=diretorio or None, prefix=f"{os.path.basename(caminho)}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+                json.dump(exemplos, arquivo, ensure_ascii=False, indent=1)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+
+def init_exemplos(app):
+    """
+    Cria o repositório de exemplos, a partir do arquivo salvo ou da semente do histórico.
+
+    Um arquivo salvo ilegível (corrompido, formato inesperado) é ignorado em favor da semente.
+    """
+    def novo_repositorio():
+        return RepositorioExemplos(app.config['EXEMPLOS_MAX'], app.config['EXEMPLOS_TTL_DIAS'] * 86400)
+
+    repositorio = novo_repositorio()
+    caminho = app.config['EXEMPLOS_PATH']
+    try:
+        carregar_exemplos(repositorio, caminho if os.path.exists(caminho) else CAMINHO_SEMENTE)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        app.logger.error(f"Arquivo de exemplos {caminho} inválido, usando a semente: {e}")
+        repositorio = novo_repositorio()
+        carregar_exemplos(repositorio, CAMINHO_SEMENTE)
+    app.extensions['exemplos'] = repositorio
+
+
+def buscar_exemplos(pergunta):
+    """
+    Retorna os EXEMPLOS_TOP_K exemplos mais parecidos com a pergunta.
+    """
+    return current_app.extensions['exemplos'].buscar(pergunta, current_app.config['EXEMPLOS_TOP_K'])
+
+
+def registrar_resposta(pergunta, query, exemplos, sucesso):
+    """
+    Contabiliza o resultado nos exemplos usados e, em caso de sucesso, guarda o novo par.
+
+    A gravação em disco não acontece durante a requisição: é agendada para daqui a
+    EXEMPLOS_SALVAR_INTERVALO segundos, juntando as alterações desse intervalo.
+    """
+    repositorio = current_app.extensions['exemplos']
+    repositorio.registrar_resultado([exemplo['id'] for exemplo in exemplos], sucesso)
+    if sucesso:
+        repositorio.adicionar(pergunta, query, sucessos=1)
+
+    if repositorio.marcar_alterado():
+        gravacao = threading.Timer(
+            current_app.config['EXEMPLOS_SALVAR_INTERVALO'],
+            descarregar_exemplos,
+            args=(current_app._get_current_object(),),
+        )
+        gravacao.daemon = True
+        gravacao.start()
+
+
+def descarregar_exemplos(app):
+    """
+    Grava os exemplos se houver alterações pendentes. Roda no agendamento de
+    registrar_resposta e ao encerrar o worker (gunicorn.conf.py).
+    """
+    repositorio = app.extensions['exemplos']
+    if not repositorio.consumir_alteracao():
+        return
+    try:
+        salvar_exemplos(repositorio, app.config['EXEMPLOS_PATH'])
+    except OSError as e:
+        app.logger.error(f"Erro ao salvar os exemplos: {e}")
@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+
+# Quantidade de latências mantidas por métrica para o cálculo de percentis
+AMOSTRAS_POR_METRICA = 500
+
+_lock = threading.Lock()
+_metricas = {}
+
+
+def _nova_metrica():
+    return {
+        "total": 0,
+        "sucessos": 0,
+        "falhas": {},
+        "latencias": deque(maxlen=AMOSTRAS_POR_METRICA),
+    }
+
+
+def registrar(grupo, nome, latencia, sucesso, motivo=None):
+    """
+    Registra uma execução (latência em segundos e resultado) em memória.
+
+    Args:
+        grupo (str): Agrupamento da métrica, por exemplo "nivel".
+        nome (str): Nome da métrica dentro do grupo, por exemplo "rapido".
+        latencia (float): Duração da execução em segundos.
+        sucesso (bool): Se a execução foi bem-sucedida.
+        motivo (str, optional): Motivo da falha, contabilizado separadamente.
+    """
+    with _lock:
+        metrica = _metricas.setdefault(grupo, {}).setdefault(nome, _nova_metrica())
+        metrica["total"] += 1
+        metrica["latencias"].append(latencia)
+        if sucesso:
+            metrica["sucessos"] += 1
+        elif motivo:
+            metrica["falhas"][motivo] = metrica["falhas"].get(motivo, 0) + 1
+
+
+def incrementar(grupo, nome, campo, quantidade=1):
+    """
+    Soma um valor a um contador extra da métrica (ex.: hedges disparados, tokens).
+    """
+    with _lock:
+        metrica = _metricas.setdefault(grupo, {}).setdefault(nome, _nova_metrica())
+        metrica[campo] = metrica.get(campo, 0) + quantidade
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def obter_metricas():
+    """
+    Retorna um resumo das métricas: totais, taxa de sucesso e latências p50/p90/p99 em ms.
+    """
+    with _lock:
+        copia = {
+            grupo: {nome: dict(metrica, latencias=list(metrica["latencias"])) for nome, metrica in itens.items()}
+            for grupo, itens in _metricas.items()
+        }
+
+    resumo = {}
+    for grupo, itens in copia.items():
+        resumo[grupo] = {}
+        for nome, metrica in itens.items():
+            latencias = metrica.pop("latencias")
+            metrica["taxa_sucesso"] = round(metrica["sucessos"] / metrica["total"], 4) if metrica["total"] else None
+            for rotulo, p in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99)):
+                valor = _percentil(latencias, p)
+                metrica[rotulo] = round(valor * 1000, 1) if valor is not None else None
+            if "hedges" in metrica:
+                metrica["taxa_hedge"] = round(metrica["hedges"] / metrica["total"], 4) if metrica["total"] else None
+                metrica["taxa_vitoria_hedge"] = (
+                    round(metrica.get("vitorias_hedge", 0) / metrica["hedges"], 4) if metrica["hedges"] else None
+                )
+            resumo[grupo][nome] = metrica
+    return resumo
+
+
+def percentil(grupo, nome, p, minimo_amostras=1):
+    """
+    Retorna o percentil p (0 a 1) das latências registradas, em segundos.
+
+    Returns:
+        float | None: O percentil, ou None se houver menos de `minimo_amostras` amostras.
+    """
+    with _lock:
+        metrica = _metricas.get(grupo, {}).get(nome)
+        latencias = list(metrica["latencias"]) if metrica else []
+    if len(latencias) < max(minimo_amostras, 1):
+        return None
+    return _percentil(latencias, p)
+
+
+def limpar_metricas():
+    """
+    Descarta todas as métricas registradas.
+    """
+    with _lock:
+        _metricas.clear()
+
@@ -1,52 +1,16 @@
+import json
 import os
-from openai import OpenAI
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from flask import current_app
 import re
+from .disjuntor_service import obter_disjuntor
+from .metricas_service import incrementar, percentil, registrar
+from .schema_service import auditoria_relevante, codificar_schema
 
-def init_openai():
-    """
-    Inicializa a chave da API da OpenAI a partir das configurações da aplicação.
-    """
-    print("Inicializando OpenAI...")
-
-def extrair_query_sql(padrao, texto):
-    """
-    Extrai o bloco de código SQL de um texto com explicações.
-
-    Args:
-        texto (str): Texto que contém a query SQL dentro de blocos de código.
-
-    Returns:
-        str: A query SQL extraída do bloco de código.
-    """
-    # Usando expressão regular para capturar o conteúdo sql entre ```sql e ```
-    match = re.search(padrao, texto, flags=re.DOTALL | re.IGNORECASE)
-    
-    if match:
-        # Extrai o bloco de código capturado
-        consulta_sql = match.group(1).strip()
-
-        current_app.logger.info(f"query: {consulta_sql} extraida do texto: {texto}")
-        return consulta_sql
-    else:
-        current_app.logger.error(f"Nenhuma query SQL encontrada no texto: {texto}")
-        # Retorna vazio ou uma mensagem caso não encontre a query SQL
-        return 0
-
-
-def traduzir_para_query(schema, pergunta):
-    """
-    Converte uma pergunta em linguagem natural para uma query SQL utilizando a API da OpenAI.
-
-    Args:
-        schema (str): O schema do banco de dados em texto.
-        pergunta (str): A pergunta em linguagem natural.
-
-    Returns:
-        str: A query SQL gerada ou uma mensagem de erro.
-    """
-    # Prompt para a API da OpenAI
-    prompt = f"""
+# Prompt de raciocínio extenso, usado pelo modelo grande
+PROMPT_COMPLETO = """
     Você é um assistente que converte perguntas em linguagem natural para queries SQL do MySQL, usando o seguinte schema do banco de dados.
     Para CADA interação com um humano, VOCÊ DEVE SEMPRE primeiro se envolver em um processo de pensamento *abrangente, natural e não filtrado* antes de responder.
     Além disso, VOCÊ também é capaz de pensar e refletir durante a resposta quando considera necessário.
@@ -305,37 +269,421 @@ def traduzir_para_query(schema, pergunta):
 
     SCHEMA DAS TABELAS: {schema}
 
-    RETORNE A QUERY SQL NO SEGUINTE FORMATO: ```sql SELECT f.nome AS vendedor_nome, s.nome AS servico_nome, COUNT(osv.servico_id) AS quantidade_vendida, SUM(osv.valor_venda - osv.valor_original) AS lucro FROM os JOIN os_servicos osv ON os.id = osv.os_id JOIN servicos s ON osv.servico_id = s.id JOIN funcionarios f ON os.vendedor_id = f.id JOIN departamentos d ON os.departamento_id = d.id WHERE d.nome = 'oficina' AND os.paga = 1 AND os.data_pagamento BETWEEN '2024-12-01' AND '2024-12-31' GROUP BY vendedor_nome, servico_nome ORDER BY quantidade_vendida DESC;``` COMO VOCÊ VÊ DENTRO DO BLOCO ```sql * ```.
+    RETORNE A QUERY SQL DENTRO DO BLOCO ```sql * ```.{exemplos}
+"""
+
+# Prompt curto para o modelo rápido: sem processo de pensamento, apenas a query
+PROMPT_COMPACTO = """
+    Você converte perguntas em linguagem natural em UMA query SELECT do MySQL, usando apenas as tabelas e colunas do schema abaixo.
+    Formato do schema: tabela(colunas) fk:coluna->tabela_referenciada -- descrição. O marcador *cud no nome da tabela indica as colunas de auditoria que ela tem, conforme a legenda na primeira linha do schema.
+    Responda somente com a query dentro de ```sql ```, sem explicações.
+
+    SCHEMA DAS TABELAS: {schema}{exemplos}
+"""
+
+# Prompt para refinar o último resultado da sessão, guardado em uma tabela SQLite local
+PROMPT_LOCAL = """
+    O usuário fez uma pergunta e agora quer refinar o resultado, que está na tabela SQLite `resultado`.
+    Escreva UMA query SELECT do SQLite sobre `resultado` que responda o refinamento usando apenas as colunas abaixo.
+    Se as colunas não bastam para responder (por exemplo, falta um filtro ou dado que só existe no banco), responda apenas NAO_LOCAL.
+    Se a pergunta não continua a anterior e é uma pergunta nova sobre outro assunto, responda apenas NOVA_PERGUNTA.
+    Responda somente com a query dentro de ```sql ```, sem explicações.
+
+    PERGUNTA ANTERIOR: {pergunta_anterior}
+
+    TABELA resultado ({total} linhas): {colunas}
+    AMOSTRA: {amostra}
+"""
+
+# Respostas do prompt local sem query, com o motivo correspondente
+MARCADORES_LOCAIS = {
+    "NAO_LOCAL": "nao_local",
+    "NOVA_PERGUNTA": "nova_pergunta",
+}
+
+PROMPTS = {
+    "completo": PROMPT_COMPLETO,
+    "compacto": PROMPT_COMPACTO,
+}
+
+# Padrões de extração da query, em ordem de preferência
+PADROES_SQL = (
+    r'```sql\s+([\s\S]*?)\s+```',
+    r'```\s+([\s\S]*?)\s+```',
+)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ErroTraducao(Exception):
     """
+    Falha ao obter uma query SQL do modelo.
 
-    try:
-        # Inicializa a chave da API da OpenAI a partir das configurações da aplicação.
-        client = OpenAI( api_key = current_app.config['OPENAI_API_KEY'])
-        # Utilizando a interface atualizada da API ChatCompletion
-        response = client.chat.completions.create(
-            model="gpt-4o",  # ou outro modelo disponível
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f"""Args: pergunta (str): A pergunta em linguagem natural. pergunta: {pergunta}"""},
-            ],
-            temperature=1,  # Para respostas mais determinísticas
+    Attributes:
+        motivo (str): "llm" (falha na chamada), "prazo" (LLM_PRAZO excedido),
+            "indisponivel" (disjuntor da OpenAI aberto), "extracao" (nenhuma query na
+            resposta), "validacao" (a resposta não é um SELECT) ou, no prompt local,
+            "nao_local" e "nova_pergunta" (MARCADORES_LOCAIS).
+    """
+    def __init__(self, mensagem, motivo):
+        super().__init__(mensagem)
+        self.motivo = motivo
+
+def init_openai():
+    """
+    Inicializa a chave da API da OpenAI a partir das configurações da aplicação.
+    """
+    print("Inicializando OpenAI...")
+
+def extrair_query_sql(padrao, texto):
+    """
+    Extrai o bloco de código SQL de um texto com explicações.
+
+    Args:
+        texto (str): Texto que contém a query SQL dentro de blocos de código.
+
+    Returns:
+        str: A query SQL extraída do bloco de código.
+    """
+    # Usando expressão regular para capturar o conteúdo sql entre ```sql e ```
+    match = re.search(padrao, texto, flags=re.DOTALL | re.IGNORECASE)
+    
+    if match:
+        # Extrai o bloco de código capturado
+        consulta_sql = match.group(1).strip()
+
+        current_app.logger.info(f"query: {consulta_sql} extraida do texto: {texto}")
+        return consulta_sql
+    else:
+        current_app.logger.error(f"Nenhuma query SQL encontrada no texto: {texto}")
+        # Retorna vazio ou uma mensagem caso não encontre a query SQL
+        return 0
+
+
+def _chamar_llm(modelo, mensagens, temperatura, tentativa=None):
+    """
+    Envia as mensagens para a API da OpenAI e retorna o conteúdo da resposta.
+
+    Args:
+        tentativa (dict, optional): Estado da tentativa. Recebe o cliente HTTP (para
+            cancelamento) e o uso de tokens; "timeout" limita a duração da chamada.
+    """
+    # O SDK da OpenAI é pesado de importar: fica fora do caminho da inicialização
+    from openai import OpenAI
+
+    tentativa = tentativa if tentativa is not None else {}
+    # Inicializa a chave da API da OpenAI a partir das configurações da aplicação.
+    client = OpenAI(
+        api_key=current_app.config['OPENAI_API_KEY'],
+        base_url=current_app.config['OPENAI_BASE_URL'],
+        timeout=tentativa.get('timeout', current_app.config['LLM_PRAZO']),
+        max_retries=0,
+    )
+    tentativa['cliente'] = client
+    response = client.chat.completions.create(
+        model=modelo,
+        messages=mensagens,
+        temperature=temperatura,
+    )
+    tentativa['uso'] = response.usage
+    # Extrair apenas o conteúdo da mensagem
+    return response.choices[0].message.content
+
+
+def _obter_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Importa o SDK aqui, e não na primeira tentativa: a importação dentro da thread
+            # atrasaria a requisição principal e distorceria a disputa com o hedge
+            import openai
+
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['LLM_MAX_CONCORRENCIA'],
+                thread_name_prefix='llm',
+            )
+    return _executor
+
+
+def _atraso_hedge(modelo):
+    """
+    Retorna após quantos segundos a requisição duplicada (hedge) é disparada, ou None.
+
+    LLM_HEDGE_ATRASO aceita segundos ("4.5"), um percentil da latência observada
+    do modelo ("p90") ou "0" para desligar. Enquanto não houver amostras
+    suficientes, o percentil cai para LLM_HEDGE_ATRASO_PADRAO.
+    """
+    config = current_app.config
+    valor = str(config['LLM_HEDGE_ATRASO']).strip().lower()
+    if valor in ('', '0', 'off'):
+        return None
+    if valor.startswith('p'):
+        atraso = percentil('llm', modelo, int(valor[1:]) / 100, config['LLM_HEDGE_MIN_AMOSTRAS'])
+        return atraso if atraso is not None else config['LLM_HEDGE_ATRASO_PADRAO']
+    return float(valor)
+
+
+def _executar_tentativa(app, modelo, mensagens, temperatura, tentativa):
+    # Roda em uma thread do executor: precisa do contexto da aplicação para config e logs
+    with app.app_context():
+        inicio = time.perf_counter()
+        try:
+            content = _chamar_llm(modelo, mensagens, temperatura, tentativa)
+        except Exception as e:
+            if not tentativa.get('cancelada'):
+                registrar("llm", modelo, time.perf_counter() - inicio, False, "llm")
+            raise ErroTraducao(str(e), "llm") from e
+        registrar("llm", modelo, time.perf_counter() - inicio, True)
+        return extrair_query(content)
+
+
+def _cancelar_perdedoras(tentativas, vencedora):
+    for futuro, tentativa in tentativas.items():
+        if futuro is vencedora:
+            continue
+        tentativa['cancelada'] = True
+        futuro.cancel()
+        # Fechar o cliente interrompe a conexão HTTP que ainda está aguardando resposta
+        client = tentativa.get('cliente')
+        if client is not None:
+            client.close()
+
+
+def _registrar_hedge(modelo, latencia, hedge, vencedora):
+    registrar("hedge", modelo, latencia, True)
+    incrementar("hedge", modelo, "hedges", int(hedge))
+    if hedge:
+        if vencedora['tipo'] == "hedge":
+            incrementar("hedge", modelo, "vitorias_hedge")
+        # Custo adicional estimado: a requisição duplicada consome o mesmo prompt e
+        # uma resposta de tamanho semelhante à vencedora
+        uso = vencedora.get('uso')
+        if uso is not None:
+            incrementar("hedge", modelo, "tokens_extras", uso.total_tokens)
+
+
+def _gerar_com_hedge(modelo, mensagens, temperatura):
+    """
+    Chama o modelo sob o prazo LLM_PRAZO. Se a resposta demorar mais que o atraso de
+    hedge, dispara uma requisição duplicada e usa a primeira query válida, cancelando a outra.
+
+    Prazos excedidos e falhas na chamada contam para o disjuntor da OpenAI; com ele
+    aberto, a chamada nem é feita.
+
+    Returns:
+        str: A query SQL.
+
+    Raises:
+        ErroTraducao: Com motivo "indisponivel" se o disjuntor estiver aberto, "prazo" se
+            nenhuma resposta válida chegar a tempo, ou a falha da última tentativa.
+    """
+    disjuntor = obter_disjuntor("openai")
+    if not disjuntor.permitir():
+        raise ErroTraducao("A API da OpenAI está indisponível (disjuntor aberto)", "indisponivel")
+
+    app = current_app._get_current_object()
+    prazo = app.config['LLM_PRAZO']
+    atraso = _atraso_hedge(modelo)
+    executor = _obter_executor()
+    inicio = time.perf_counter()
+    tentativas = {}
+
+    def disparar(tipo):
+        tentativa = {"tipo": tipo, "timeout": max(prazo - (time.perf_counter() - inicio), 0.001)}
+        futuro = executor.submit(_executar_tentativa, app, modelo, mensagens, temperatura, tentativa)
+        tentativas[futuro] = tentativa
+        return futuro
+
+    pendentes = {disparar("primaria")}
+    hedge = False
+    ultimo_erro = None
+
+    while pendentes:
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= prazo:
+            break
+
+        espera = prazo - decorrido
+        if not hedge and atraso is not None:
+            espera = min(espera, max(atraso - decorrido, 0))
+
+        prontos, pendentes = wait(pendentes, timeout=espera, return_when=FIRST_COMPLETED)
+        for futuro in prontos:
+            try:
+                query = futuro.result()
+            except ErroTraducao as e:
+                ultimo_erro = e
+                continue
+
+            _cancelar_perdedoras(tentativas, futuro)
+            _registrar_hedge(modelo, time.perf_counter() - inicio, hedge, tentativas[futuro])
+            disjuntor.sucesso()
+            return query
+
+        if pendentes and not hedge and atraso is not None and time.perf_counter() - inicio >= atraso:
+            hedge = True
+            pendentes.add(disparar("hedge"))
+
+    _cancelar_perdedoras(tentativas, None)
+    if pendentes or ultimo_erro is None:
+        disjuntor.falha()
+        registrar("hedge", modelo, time.perf_counter() - inicio, False, "prazo")
+        incrementar("hedge", modelo, "hedges", int(hedge))
+        raise ErroTraducao(f"Prazo de {prazo}s excedido aguardando a resposta do modelo {modelo}", "prazo")
+
+    # Uma resposta sem query válida mostra que a API está respondendo
+    if ultimo_erro.motivo == "llm":
+        disjuntor.falha()
+    else:
+        disjuntor.sucesso()
+    registrar("hedge", modelo, time.perf_counter() - inicio, False, ultimo_erro.motivo)
+    incrementar("hedge", modelo, "hedges", int(hedge))
+    raise ultimo_erro
+
+
+def formatar_exemplos(exemplos):
+    """
+    Formata pares pergunta -> SQL já validados como exemplos few-shot do prompt.
+    """
+    if not exemplos:
+        return ""
+    blocos = [f"    pergunta: {exemplo['pergunta']}\n    ```sql\n{exemplo['query']}\n    ```" for exemplo in exemplos]
+    return "\n\n    EXEMPLOS DE PERGUNTAS PARECIDAS JÁ RESPONDIDAS COM SUCESSO:\n" + "\n".join(blocos)
+
+
+def montar_mensagens(schema, pergunta, prompt="completo", erro_anterior=None, exemplos=None):
+    """
+    Monta as mensagens enviadas ao modelo.
+
+    Args:
+        schema (dict | str): O schema do banco de dados (snapshot) ou já em texto.
+        pergunta (str): A pergunta em linguagem natural.
+        prompt (str): "completo" (raciocínio extenso) ou "compacto".
+        erro_anterior (str, optional): Query e erro de uma tentativa anterior, para correção.
+        exemplos (list, optional): Exemplos pergunta -> SQL recuperados para esta pergunta.
+
+    Returns:
+        list: As mensagens no formato da API de chat.
+    """
+    # Codifica o snapshot do schema conforme a configuração (texto já pronto é usado como está)
+    if isinstance(schema, dict):
+        schema = codificar_schema(
+            schema,
+            current_app.config['SCHEMA_ENCODING'],
+            incluir_auditoria=auditoria_relevante(pergunta),
         )
 
-        # Extrair apenas o conteúdo da mensagem
-        content = response.choices[0].message.content
+    conteudo = f"""Args: pergunta (str): A pergunta em linguagem natural. pergunta: {pergunta}"""
+    if erro_anterior:
+        conteudo += f"\n\nUma tentativa anterior falhou, corrija-a:\n{erro_anterior}"
 
-        # Extrai o bloco de código SQL de um texto com explicações.
-        query = extrair_query_sql(r'```sql\s+([\s\S]*?)\s+```', content)
+    return [
+        {"role": "system", "content": PROMPTS[prompt].format(schema=schema, exemplos=formatar_exemplos(exemplos))},
+        {"role": "user", "content": conteudo},
+    ]
 
-        # Se não encontrar a query, tenta extrair de outro padrão
-        if query == 0:
-            query = extrair_query_sql(r'```\s+([\s\S]*?)\s+```', content)
 
-        # Validação simples: Garantir que a query começa com SELECT
-        if not re.match(r'^SELECT', query, re.IGNORECASE):
-            raise ValueError(f"Problemas ao buscar a query na RESPOSTA do agente: {content}")
+def extrair_query(content):
+    """
+    Extrai e valida a query SQL da resposta do modelo.
 
-        return query
-    except Exception as e:
+    Args:
+        content (str): A resposta completa do modelo.
+
+    Returns:
+        str: A query SQL.
+
+    Raises:
+        ErroTraducao: Se nenhuma query for encontrada ou se ela não for um SELECT.
+    """
+    # O prompt local pode responder só um marcador, com ou sem bloco de código
+    marcador = re.sub(r'^`*(?:sql)?|`*$', '', (content or "").strip(), flags=re.IGNORECASE).strip()
+    if marcador in MARCADORES_LOCAIS:
+        raise ErroTraducao(f"O modelo respondeu {marcador}", MARCADORES_LOCAIS[marcador])
+
+    for padrao in PADROES_SQL:
+        query = extrair_query_sql(padrao, content)
+        if query != 0:
+            break
+    else:
+        # Modelos rápidos às vezes respondem apenas com a query, sem bloco de código
+        if not content or not re.match(r'^\s*SELECT\b', content, re.IGNORECASE):
+            raise ErroTraducao(f"Problemas ao buscar a query na RESPOSTA do agente: {content}", "extracao")
+        query = content.strip()
+
+    # Validação simples: Garantir que a query começa com SELECT
+    if not re.match(r'^SELECT', query, re.IGNORECASE):
+        raise ErroTraducao(f"Problemas ao buscar a query na RESPOSTA do agente: {content}", "validacao")
+
+    return query
+
+
+def gerar_query(schema, pergunta, modelo="gpt-4o", prompt="completo", temperatura=1, erro_anterior=None, exemplos=None):
+    """
+    Converte uma pergunta em query SQL, lançando ErroTraducao em caso de falha.
+
+    Args:
+        schema (dict | str): O schema do banco de dados (snapshot) ou já em texto.
+        pergunta (str): A pergunta em linguagem natural.
+        modelo (str): O modelo da OpenAI.
+        prompt (str): "completo" ou "compacto".
+        temperatura (float): Temperatura da amostragem.
+        erro_anterior (str, optional): Query e erro de uma tentativa anterior.
+        exemplos (list, optional): Exemplos pergunta -> SQL para o prompt.
+
+    Returns:
+        str: A query SQL gerada.
+    """
+    mensagens = montar_mensagens(schema, pergunta, prompt, erro_anterior, exemplos)
+    return _gerar_com_hedge(modelo, mensagens, temperatura)
+
+
+def gerar_query_local(tabela, pergunta_anterior, pergunta, modelo, temperatura=0):
+    """
+    Traduz um refinamento ("agora só oficina") em uma query SQLite sobre o último resultado.
+
+    Args:
+        tabela (dict): "colunas" (nome -> tipo SQLite), "amostra" (algumas linhas) e "total".
+        pergunta_anterior (str): A pergunta que gerou o resultado.
+        pergunta (str): O refinamento pedido.
+        modelo (str): O modelo da OpenAI (o do nível mais rápido).
+        temperatura (float): Temperatura da amostragem.
+
+    Returns:
+        str: A query SQLite.
+
+    Raises:
+        ErroTraducao: Se o modelo não retornar uma query, inclusive quando responde
+            NAO_LOCAL porque o resultado não basta para o refinamento.
+    """
+    colunas = ", ".join(f"{nome} {tipo}" for nome, tipo in tabela['colunas'].items())
+    mensagens = [
+        {"role": "system", "content": PROMPT_LOCAL.format(
+            pergunta_anterior=pergunta_anterior,
+            total=tabela['total'],
+            colunas=colunas,
+            amostra=json.dumps(tabela['amostra'], ensure_ascii=False, default=str),
+        )},
+        {"role": "user", "content": pergunta},
+    ]
+    return _gerar_com_hedge(modelo, mensagens, temperatura)
+
+
+def traduzir_para_query(schema, pergunta):
+    """
+    Converte uma pergunta em linguagem natural para uma query SQL utilizando a API da OpenAI.
+
+    Args:
+        schema (dict | str): O schema do banco de dados (snapshot) ou já em texto.
+        pergunta (str): A pergunta em linguagem natural.
+
+    Returns:
+        str: A query SQL gerada ou uma mensagem de erro.
+    """
+    try:
+        return gerar_query(schema, pergunta)
+    except ErroTraducao as e:
         current_app.logger.error(str(e))
-        return str(e)
\ No newline at end of file
+        return f"Erro na tradução da pergunta: {e}"
@@ -0,0 +1,299 @@
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from .db_service import PADRAO_TOKEN_SQL, executar_query, parametrizar_query
+from .sessao_service import obter_resultado
+
+# Alias da query gerada quando ela é reexecutada como tabela derivada
+ALIAS_PAGINA = "_pagina"
+
+
+class ErroPaginacao(Exception):
+    """
+    Cursor de página inválido, expirado ou cujo resultado não pode mais ser obtido.
+    """
+
+
+def _serializador():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='paginacao')
+
+
+def _codificar_valor(valor):
+    # O token é JSON: tipos do MySQL levam uma marca para voltar ao tipo original na comparação
+    if isinstance(valor, Decimal):
+        return {"decimal": str(valor)}
+    if isinstance(valor, datetime):
+        return {"datetime": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"date": valor.isoformat()}
+    if isinstance(valor, timedelta):
+        return {"segundos": valor.total_seconds()}
+    if isinstance(valor, (bytes, bytearray)):
+        return {"texto": bytes(valor).decode('utf-8', 'replace')}
+    return valor
+
+
+def _decodificar_valor(valor):
+    if not isinstance(valor, dict):
+        return valor
+    (tipo, conteudo), = valor.items()
+    if tipo == "decimal":
+        return Decimal(conteudo)
+    if tipo == "datetime":
+        return datetime.fromisoformat(conteudo)
+    if tipo == "date":
+        return date.fromisoformat(conteudo)
+    if tipo == "segundos":
+        return timedelta(seconds=conteudo)
+    return conteudo
+
+
+def chaves_ordenacao(query, colunas):
+    """
+    Mapeia o ORDER BY de nível superior da query para colunas do resultado.
+
+    Args:
+        query (str): A query SQL gerada.
+        colunas (list): As colunas do resultado, na ordem do SELECT.
+
+    Returns:
+        list | None: Pares (coluna, decrescente), ou None se não houver ORDER BY ou se
+            algum item não for uma coluna do resultado (expressão, COLLATE etc.).
+    """
+    profundidade = 0
+    inicio = fim = None
+    fim_select = None
+    anterior = None
+    for match in PADRAO_TOKEN_SQL.finditer(query):
+        tipo, texto = match.lastgroup, match.group().upper()
+        if tipo == "abre":
+            profundidade += 1
+        elif tipo == "fecha":
+            profundidade -= 1
+        elif tipo == "palavra" and profundidade == 0:
+            if texto == "FROM" and fim_select is None:
+                fim_select = match.start()
+            elif texto == "BY" and anterior == "ORDER":
+                inicio, fim = match.end(), None
+            elif texto in ("LIMIT", "FOR", "LOCK") and inicio is not None and fim is None:
+                fim = match.start()
+        anterior = texto if tipo == "palavra" else None
+    if inicio is None:
+        return None
+    select = query[:fim_select].replace('`', '')
+
+    por_nome = {coluna.lower(): coluna for coluna in colunas}
+    chaves = []
+    for item in _separar_itens(query[inicio:fim].strip().rstrip(';')):
+        partes = item.split()
+        decrescente = partes[-1].upper() == "DESC"
+        if partes[-1].upper() in ("ASC", "DESC"):
+            partes = partes[:-1]
+        if len(partes) != 1:
+            return None
+        expressao = partes[0].replace('`', '')
+        if expressao.isdigit():
+            posicao = int(expressao)
+            if not 1 <= posicao <= len(colunas):
+                return None
+            coluna = colunas[posicao - 1]
+        else:
+            coluna = por_nome.get(expressao.rsplit('.', 1)[-1].lower())
+            # "f.nome" só é a coluna "nome" do resultado se o próprio SELECT a expõe assim
+            if '.' in expressao and coluna is not None and not re.search(
+                rf"(?<![\w.]){re.escape(expressao)}\s*(?:,|$|AS\s+{re.escape(coluna)}\b)", select.strip(), re.IGNORECASE
+            ):
+                coluna = None
+            if coluna is None:
+                return None
+        chaves.append((coluna, decrescente))
+    return chaves or None
+
+
+def _separar_itens(clausula):
+    itens = []
+    profundidade = 0
+    atual = ""
+    for caractere in clausula:
+        if caractere == "(":
+            profundidade += 1
+        elif caractere == ")":
+            profundidade -= 1
+        elif caractere == "," and profundidade == 0:
+            itens.append(atual.strip())
+            atual = ""
+            continue
+        atual += caractere
+    if atual.strip():
+        itens.append(atual.strip())
+    return itens
+
+
+def _coluna(coluna):
+    return f"{ALIAS_PAGINA}.`{coluna.replace('`', '``')}`"
+
+
+def _condicao_keyset(chaves):
+    """
+    Monta a condição "linha na posição da fronteira ou depois", com direções mistas.
+
+    NULL fica antes de qualquer valor no MySQL, então em colunas decrescentes ele
+    também está depois da fronteira.
+    """
+    termos = []
+    for indice in range(len(chaves) + 1):
+        iguais = [f"{_coluna(c)} = %s" for c, _ in chaves[:indice]]
+        if indice == len(chaves):
+            termos.append("(" + " AND ".join(iguais) + ")")
+            break
+        coluna, decrescente = chaves[indice]
+        comparacao = f"{_coluna(coluna)} {'<' if decrescente else '>'} %s"
+        if decrescente:
+            comparacao = f"({comparacao} OR {_coluna(coluna)} IS NULL)"
+        termos.append("(" + " AND ".join(iguais + [comparacao]) + ")")
+    return " OR ".join(termos)
+
+
+def _parametros_keyset(chaves, fronteira):
+    # Cada termo repete os valores das chaves anteriores antes da própria comparação
+    params = []
+    for indice in range(len(chaves)):
+        params.extend(fronteira[:indice + 1])
+    params.extend(fronteira)
+    return params
+
+
+def _chave(linha, chaves):
+    return [linha.get(coluna) for coluna, _ in chaves]
+
+
+def _estado_consulta(estado, linhas_vistas, chaves, posicao):
+    """
+    Atualiza o estado do token para reexecutar a query no MySQL a partir de `posicao`.
+    """
+    estado.pop("v", None)
+    estado.pop("s", None)
+    fronteira = _chave(linhas_vistas[-1], chaves) if chaves else None
+    if fronteira is not None and None not in fronteira:
+        # Linhas empatadas com a fronteira já entregues são puladas na próxima página
+        empatadas = 0
+        for linha in reversed(linhas_vistas):
+            if _chave(linha, chaves) != fronteira:
+                break
+            empatadas += 1
+        estado["v"] = [_codificar_valor(valor) for valor in fronteira]
+        estado["s"] = empatadas
+    estado["o"] = posicao
+
+
+def _pagina(colunas, linhas, estado, total=None):
+    return {
+        "colunas": colunas,
+        "linhas": [[linha.get(coluna) for coluna in colunas] for linha in linhas],
+        "total": total,
+        "cursor": _serializador().dumps(estado) if estado else None,
+    }
+
+
+def primeira_pagina(resposta, sessao_id=None):
+    """
+    Monta a primeira página da resposta e o cursor para as seguintes.
+
+    As próximas páginas vêm do resultado guardado na sessão enquanto ele existir; senão,
+    a query é reexecutada no MySQL com keyset pelas colunas do ORDER BY (ou com OFFSET,
+    quando a ordenação não é por colunas do resultado).
+
+    Args:
+        resposta (dict): A resposta de responder_pergunta, com a lista de resultados.
+        sessao_id (str, optional): A sessão do usuário.
+
+    Returns:
+        dict: "colunas", "linhas" (listas de valores), "total" e "cursor" (None na última página).
+    """
+    resultados = resposta['resultados']
+    tamanho = current_app.config['PAGINA_TAMANHO']
+    colunas = list(resultados[0]) if resultados else []
+    linhas = resultados[:tamanho]
+    if len(resultados) <= tamanho:
+        return _pagina(colunas, linhas, None, len(resultados))
+
+    estado = {"c": colunas, "f": len(resultados)}
+    retido = obter_resultado(sessao_id) if sessao_id is not None else None
+    if retido is not None and retido['linhas'] is resultados:
+        estado["r"] = retido['id']
+    if resposta['nivel'] != "local":
+        # Refinamentos locais só existem no SQLite da sessão: não há query para o MySQL
+        template, params = parametrizar_query(resposta['query'].strip().rstrip(';'))
+        chaves = chaves_ordenacao(template, colunas)
+        estado.update({"q": template, "p": [_codificar_valor(p) for p in params]})
+        if chaves:
+            estado["k"] = [[coluna, decrescente] for coluna, decrescente in chaves]
+        _estado_consulta(estado, linhas, chaves, tamanho)
+    if "r" not in estado and "q" not in estado:
+        estado = None
+    return _pagina(colunas, linhas, estado, len(resultados))
+
+
+def proxima_pagina(cursor, sessao_id=None):
+    """
+    Retorna a página apontada pelo cursor.
+
+    Raises:
+        ErroPaginacao: Se o cursor for inválido ou expirado, ou se o resultado não puder
+            mais ser obtido (não está na sessão e não pode ser reexecutado no MySQL).
+        BancoIndisponivel: Se a página precisar do MySQL e ele estiver indisponível.
+    """
+    try:
+        estado = _serializador().loads(cursor, max_age=current_app.config['PAGINA_TOKEN_TTL'])
+    except BadSignature as e:
+        raise ErroPaginacao("Cursor de página inválido ou expirado.") from e
+
+    tamanho = current_app.config['PAGINA_TAMANHO']
+    colunas = estado['c']
+    posicao = estado['o'] if 'o' in estado else estado.get('i', tamanho)
+    total = estado['f']
+
+    retido = obter_resultado(sessao_id) if sessao_id is not None and 'r' in estado else None
+    if retido is not None and retido['id'] == estado['r']:
+        linhas = retido['linhas'][posicao:posicao + tamanho]
+        fim = posicao + len(linhas)
+        if 'q' in estado:
+            chaves = [tuple(chave) for chave in estado['k']] if 'k' in estado else None
+            _estado_consulta(estado, retido['linhas'][:fim], chaves, fim)
+        else:
+            estado['i'] = fim
+        return _pagina(colunas, linhas, estado if fim < total else None, total)
+
+    if 'q' not in estado:
+        raise ErroPaginacao("O resultado expirou. Faça a pergunta novamente.")
+
+    params = [_decodificar_valor(p) for p in estado['p']]
+    if 'v' in estado:
+        chaves = [tuple(chave) for chave in estado['k']]
+        fronteira = [_decodificar_valor(valor) for valor in estado['v']]
+        pular = estado['s']
+        query = (
+            f"SELECT * FROM ({estado['q']}) AS {ALIAS_PAGINA} WHERE {_condicao_keyset(chaves)} "
+            f"ORDER BY " + ", ".join(f"{_coluna(c)} {'DESC' if d else 'ASC'}" for c, d in chaves)
+            + " LIMIT %s"
+        )
+        params += _parametros_keyset(chaves, fronteira) + [pular + tamanho]
+    else:
+        chaves = None
+        pular = 0
+        query = f"SELECT * FROM ({estado['q']}) AS {ALIAS_PAGINA} LIMIT %s OFFSET %s"
+        params += [tamanho, posicao]
+
+    resultados = executar_query(query, tuple(params))
+    if not isinstance(resultados, list):
+        raise ErroPaginacao(resultados)
+
+    linhas = resultados[pular:]
+    fim = posicao + len(linhas)
+    _estado_consulta(estado, resultados, chaves, fim)
+    if 'r' in estado:
+        # O resultado da sessão mudou: as próximas páginas também vêm do MySQL
+        del estado['r']
+    return _pagina(colunas, linhas, estado if linhas and fim < total else None, total)
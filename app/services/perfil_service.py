@@ -0,0 +1,183 @@
+import hmac
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, request
+
+# Só um perfil do processo inteiro por vez (endpoint ou sinal)
+_perfil_processo = threading.Lock()
+
+
+def colapsar_pilha(frame):
+    """
+    Converte a pilha de um frame em "modulo:funcao;...", da raiz para a folha.
+    """
+    funcoes = []
+    while frame is not None:
+        codigo = frame.f_code
+        funcoes.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(codigo, 'co_qualname', codigo.co_name)}")
+        frame = frame.f_back
+    return ";".join(reversed(funcoes))
+
+
+def formatar_colapsado(contagens):
+    """
+    Formata as contagens no formato "pilha quantidade" por linha, lido por flamegraph.pl e speedscope.
+    """
+    return "".join(f"{pilha} {quantidade}\n" for pilha, quantidade in contagens.most_common())
+
+
+class AmostradorPilhas:
+    """
+    Perfilador por amostragem: a cada `intervalo` segundos lê as pilhas das threads do
+    processo (sys._current_frames) e conta as pilhas iguais.
+
+    Não instrumenta o código: roda em uma thread própria, com custo proporcional à
+    frequência de amostragem, e nenhum custo quando não há amostragem em andamento.
+
+    Args:
+        intervalo (float): Segundos entre as amostras.
+        threads (set, optional): Identificadores das threads amostradas; todas se None.
+        ignorar (set, optional): Identificadores das threads que não entram no perfil.
+    """
+    def __init__(self, intervalo, threads=None, ignorar=()):
+        self.intervalo = intervalo
+        self.threads = set(threads) if threads is not None else None
+        self.ignorar = set(ignorar)
+        self.contagens = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _amostrar(self):
+        propria = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == propria or ident in self.ignorar:
+                continue
+            if self.threads is not None and ident not in self.threads:
+                continue
+            self.contagens[colapsar_pilha(frame)] += 1
+        self.amostras += 1
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self._amostrar()
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name='perfil', daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        """
+        Encerra a amostragem e retorna as contagens por pilha colapsada.
+        """
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.contagens
+
+
+def perfilar_processo(segundos, intervalo, ignorar=()):
+    """
+    Amostra todas as threads do processo por `segundos`.
+
+    Returns:
+        Counter | None: As contagens por pilha, ou None se já houver um perfil do
+            processo em andamento.
+    """
+    if not _perfil_processo.acquire(blocking=False):
+        return None
+    try:
+        amostrador = AmostradorPilhas(intervalo, ignorar=ignorar).iniciar()
+        time.sleep(segundos)
+        return amostrador.parar()
+    finally:
+        _perfil_processo.release()
+
+
+def salvar_perfil(contagens, origem, diretorio):
+    """
+    Salva o perfil colapsado em `diretorio`, com a origem e o pid no nome do arquivo.
+
+    Returns:
+        str: O caminho do arquivo.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"perfil-{origem}-{os.getpid()}-{int(time.time() * 1000)}.folded")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(formatar_colapsado(contagens))
+    return caminho
+
+
+def token_valido(token):
+    """
+    Verifica o token de administração (PERFIL_TOKEN); sem token configurado, nada é aceito.
+    """
+    esperado = current_app.config['PERFIL_TOKEN']
+    return bool(esperado) and token is not None and hmac.compare_digest(token.encode(), esperado.encode())
+
+
+def instalar_sinal_perfil(app):
+    """
+    Instala o sinal PERFIL_SINAL (padrão SIGUSR2): ao recebê-lo, o processo se perfila por
+    PERFIL_SINAL_SEGUNDOS em segundo plano e salva o resultado em PERFIL_DIRETORIO.
+
+    Só pode ser chamado na thread principal. No gunicorn, é chamado em cada worker
+    (post_worker_init), já que o worker redefine os sinais ao iniciar.
+    """
+    nome = app.config['PERFIL_SINAL']
+    if not nome or not hasattr(signal, nome) or threading.current_thread() is not threading.main_thread():
+        return
+    segundos = app.config['PERFIL_SINAL_SEGUNDOS']
+    intervalo = app.config['PERFIL_INTERVALO']
+    diretorio = app.config['PERFIL_DIRETORIO']
+
+    def perfilar_para_arquivo():
+        contagens = perfilar_processo(segundos, intervalo)
+        if contagens is None:
+            app.logger.info("Perfil ignorado: já há um perfil do processo em andamento")
+            return
+        app.logger.info(f"Perfil do processo salvo em {salvar_perfil(contagens, 'sinal', diretorio)}")
+
+    def tratar(signum, frame):
+        # O tratador roda na thread principal: a amostragem segue em outra thread
+        threading.Thread(target=perfilar_para_arquivo, name='perfil-sinal', daemon=True).start()
+
+    signal.signal(getattr(signal, nome), tratar)
+
+
+def init_perfil(app):
+    """
+    Habilita o perfil por requisição (cabeçalho X-Perfil-Token com o PERFIL_TOKEN) e o
+    sinal de perfil do processo.
+
+    A requisição perfilada recebe no cabeçalho X-Perfil-Arquivo o nome do arquivo
+    salvo em PERFIL_DIRETORIO com as pilhas colapsadas da thread que a atendeu.
+    """
+    @app.before_request
+    def iniciar_perfil_requisicao():
+        if token_valido(request.headers.get('X-Perfil-Token')):
+            g.amostrador = AmostradorPilhas(
+                app.config['PERFIL_INTERVALO'], threads={threading.get_ident()}
+            ).iniciar()
+
+    @app.after_request
+    def salvar_perfil_requisicao(response):
+        amostrador = g.pop('amostrador', None)
+        if amostrador is not None:
+            caminho = salvar_perfil(amostrador.parar(), "requisicao", app.config['PERFIL_DIRETORIO'])
+            response.headers['X-Perfil-Arquivo'] = os.path.basename(caminho)
+        return response
+
+    @app.teardown_request
+    def parar_perfil_requisicao(exc):
+        # Se a view falhou, o after_request não roda: a amostragem não pode continuar
+        amostrador = g.pop('amostrador', None)
+        if amostrador is not None:
+            amostrador.parar()
+
+    instalar_sinal_perfil(app)
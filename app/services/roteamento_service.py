@@ -0,0 +1,153 @@
+import json
+import time
+from flask import current_app
+from .db_service import BancoIndisponivel, executar_query, validar_query, validar_seguranca
+from .disjuntor_service import obter_disjuntor
+from .exemplos_service import buscar_exemplos, registrar_resposta
+from .metricas_service import incrementar, registrar
+from .openai_service import ErroTraducao, gerar_query
+from .sessao_service import (
+    eh_refinamento,
+    guardar_resposta,
+    guardar_resultado,
+    obter_resposta,
+    obter_resultado,
+    responder_localmente,
+)
+
+# Falhas da OpenAI ou do MySQL, e não da pergunta: a resposta guardada é servida no lugar
+MOTIVOS_INDISPONIBILIDADE = {"indisponivel", "prazo", "llm"}
+
+MENSAGEM_INDISPONIVEL = "O serviço está temporariamente indisponível. Tente novamente em instantes."
+
+
+def _tentar_nivel(nivel, schema, pergunta, erro_anterior, exemplos):
+    """
+    Gera e executa a query em um nível de modelo.
+
+    Returns:
+        tuple: (motivo da falha ou None, query, resultados ou mensagem de erro, latência do LLM)
+    """
+    inicio = time.perf_counter()
+    try:
+        query = gerar_query(
+            schema,
+            pergunta,
+            modelo=nivel['modelo'],
+            prompt=nivel['prompt'],
+            temperatura=nivel['temperatura'],
+            erro_anterior=erro_anterior,
+            exemplos=exemplos,
+        )
+    except ErroTraducao as e:
+        current_app.logger.error(str(e))
+        return e.motivo, "", str(e), time.perf_counter() - inicio
+    latencia = time.perf_counter() - inicio
+
+    erro = validar_seguranca(query)
+    if erro:
+        return "validacao", query, erro, latencia
+
+    # Compila a query no espelho local do schema antes de ocupar uma conexão do MySQL
+    erro = validar_query(query)
+    if erro:
+        return "validacao", query, json.dumps(erro, ensure_ascii=False), latencia
+
+    try:
+        resultados = executar_query(query)
+    except BancoIndisponivel as e:
+        current_app.logger.error(str(e))
+        return "indisponivel", query, str(e), latencia
+    if not isinstance(resultados, list):
+        return "banco", query, resultados, latencia
+
+    return None, query, resultados, latencia
+
+
+def _responder_indisponivel(pergunta, sessao_id, nivel=None):
+    """
+    Responde com a última resposta guardada para a pergunta, marcada como desatualizada.
+
+    Returns:
+        dict: A resposta guardada com "desatualizada" e a "idade" em segundos, ou a
+            mensagem de indisponibilidade com "indisponivel" se não houver resposta guardada.
+    """
+    guardada = obter_resposta(pergunta)
+    if guardada is None:
+        incrementar("respostas", "indisponivel", "sem_cache")
+        return {"query": "", "resultados": MENSAGEM_INDISPONIVEL, "nivel": nivel, "indisponivel": True}
+
+    incrementar("respostas", "indisponivel", "desatualizadas")
+    if sessao_id is not None:
+        guardar_resultado(sessao_id, pergunta, guardada['query'], guardada['linhas'])
+    return {
+        "query": guardada['query'],
+        "resultados": guardada['linhas'],
+        "nivel": "cache",
+        "desatualizada": True,
+        "idade": round(time.time() - guardada['criado_em']),
+    }
+
+
+def responder_pergunta(schema, pergunta, sessao_id=None):
+    """
+    Responde a pergunta começando pelo nível de modelo mais barato (LLM_NIVEIS) e
+    escalando para o próximo apenas nas falhas listadas em LLM_ESCALAR_EM.
+
+    Com `sessao_id`, refinamentos do último resultado da sessão ("agora só oficina",
+    "top 10") são respondidos localmente, e só vão ao MySQL quando ele não basta.
+
+    Se a OpenAI ou o MySQL estiverem indisponíveis (disjuntor aberto, prazo excedido),
+    a última resposta guardada para a mesma pergunta é devolvida como desatualizada.
+
+    Args:
+        schema (dict | str): O schema do banco de dados (snapshot) ou já em texto.
+        pergunta (str): A pergunta em linguagem natural.
+        sessao_id (str, optional): A sessão do usuário.
+
+    Returns:
+        dict: "query", "resultados" (lista de linhas ou mensagem de erro) e "nivel"
+            com o nome do nível que produziu a resposta ("local" para refinamentos e
+            "cache" para respostas guardadas, que trazem "desatualizada" e "idade").
+    """
+    anterior = obter_resultado(sessao_id) if sessao_id is not None else None
+    if anterior is not None and eh_refinamento(pergunta):
+        resposta, refinamento = responder_localmente(anterior, pergunta)
+        # Sozinho o refinamento não faz sentido: segue junto com a pergunta anterior.
+        # Se nem as regras nem o modelo o confirmaram, a pergunta segue como nova.
+        if refinamento:
+            pergunta = f"{anterior['pergunta']}\nRefinamento: {pergunta}"
+        if resposta is not None:
+            guardar_resultado(sessao_id, pergunta, resposta['query'], resposta['resultados'])
+            return resposta
+
+    # Com um disjuntor aberto a pergunta falharia de qualquer forma: responde na hora
+    if obter_disjuntor("openai").aberto or obter_disjuntor("mysql").aberto:
+        return _responder_indisponivel(pergunta, sessao_id)
+
+    niveis = current_app.config['LLM_NIVEIS']
+    escalar_em = current_app.config['LLM_ESCALAR_EM']
+    erro_anterior = None
+    # Os mesmos exemplos valem para todos os níveis: a busca é feita uma única vez
+    exemplos = buscar_exemplos(pergunta)
+
+    for indice, nivel in enumerate(niveis):
+        motivo, query, resultados, latencia = _tentar_nivel(nivel, schema, pergunta, erro_anterior, exemplos)
+        registrar("nivel", nivel['nome'], latencia, motivo is None, motivo)
+
+        if motivo is None or indice == len(niveis) - 1 or motivo not in escalar_em:
+            break
+
+        current_app.logger.info(f"Escalando do nível {nivel['nome']} após falha de {motivo}: {resultados}")
+        # A falha vai junto para o próximo nível corrigir em vez de recomeçar do zero
+        erro_anterior = f"query: {query}\nerro: {resultados}" if query else str(resultados)
+
+    if motivo in MOTIVOS_INDISPONIBILIDADE:
+        return _responder_indisponivel(pergunta, sessao_id, nivel['nome'])
+
+    registrar_resposta(pergunta, query, exemplos, motivo is None)
+    if motivo is None:
+        guardar_resposta(pergunta, query, resultados)
+        if sessao_id is not None:
+            guardar_resultado(sessao_id, pergunta, query, resultados)
+    return {"query": query, "resultados": resultados, "nivel": nivel['nome']}
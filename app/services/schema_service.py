@@ -0,0 +1,440 @@
+import hashlib
+import json
+import os
+import re
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .db_service import conectar
+
+# Versão do formato do arquivo de snapshot. Snapshots de outro formato são descartados.
+SNAPSHOT_FORMATO = 1
+
+# Checksum barato por tabela: um MD5 por tipo de metadado (colunas, FKs e índices).
+QUERY_CHECKSUM = """
+    SELECT TABLE_NAME AS tabela, 'c' AS tipo,
+        MD5(GROUP_CONCAT(CONCAT_WS(':', COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE) ORDER BY ORDINAL_POSITION)) AS checksum
+    FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s GROUP BY TABLE_NAME
+    UNION ALL
+    SELECT TABLE_NAME, 'f',
+        MD5(GROUP_CONCAT(CONCAT_WS(':', COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME) ORDER BY COLUMN_NAME))
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL GROUP BY TABLE_NAME
+    UNION ALL
+    SELECT TABLE_NAME, 'i',
+        MD5(GROUP_CONCAT(CONCAT_WS(':', INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE) ORDER BY INDEX_NAME, SEQ_IN_INDEX))
+    FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s GROUP BY TABLE_NAME
+"""
+
+# Colunas de auditoria omitidas na codificação compacta, a menos que a pergunta as mencione
+COLUNAS_AUDITORIA = ("created_at", "updated_at", "deleted_at")
+
+# Termos da pergunta que tornam as colunas de auditoria relevantes
+TERMOS_AUDITORIA = re.compile(
+    r'\b(criad[oa]s?|cadastrad[oa]s?|cadastro|cria[cç][aã]o|atualizad[oa]s?|atualiza[cç][aã]o|'
+    r'alterad[oa]s?|exclu[ií]d[oa]s?|exclus[aã]o|deletad[oa]s?|apagad[oa]s?|created_at|updated_at|deleted_at)\b',
+    re.IGNORECASE,
+)
+
+CODIFICACOES = ("compacto", "texto")
+
+_cache_codificacao = {}
+
+QUERY_TABELAS = """
+    SELECT TABLE_NAME AS tabela, TABLE_COMMENT AS comentario
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'{filtro}
+"""
+
+QUERY_COLUNAS = """
+    SELECT TABLE_NAME AS tabela, COLUMN_NAME AS coluna, DATA_TYPE AS tipo
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = %s{filtro}
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+QUERY_FKS = """
+    SELECT TABLE_NAME AS tabela, COLUMN_NAME AS coluna,
+        REFERENCED_TABLE_NAME AS tabela_ref, REFERENCED_COLUMN_NAME AS coluna_ref
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL{filtro}
+"""
+
+QUERY_INDICES = """
+    SELECT TABLE_NAME AS tabela, INDEX_NAME AS indice, COLUMN_NAME AS coluna, NON_UNIQUE AS nao_unico
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = %s{filtro}
+    ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+"""
+
+
+def schema_de_texto(texto):
+    """
+    Converte o schema mantido manualmente (pseudo-JSON) no modelo compacto em memória.
+
+    Args:
+        texto (str): O schema no formato de `schema_estatico.SCHEMA`.
+
+    Returns:
+        dict: O schema no formato de snapshot, com versão 0 e sem checksums.
+    """
+    corpo = re.sub(r'"colunas": \((.*?)\)', r'"colunas": [\1]', texto.strip().rstrip(','))
+    tabelas_texto = json.loads('{' + corpo + '}')
+
+    tabelas = {}
+    for nome, info in tabelas_texto.items():
+        fks = {}
+        for relacionamento in info.get('relacionamentos', {}).values():
+            # Formato: "tabela_ref.coluna_ref = tabela.coluna"
+            referencia, local = [lado.strip() for lado in relacionamento.split('=')]
+            fks[local.split('.', 1)[1]] = referencia
+        tabelas[nome] = {
+            "descricao": info.get('descricao', ''),
+            "colunas": [[coluna, ""] for coluna in info.get('colunas', [])],
+            "fks": fks,
+            "indices": {},
+            "checksum": "",
+        }
+
+    return {"formato": SNAPSHOT_FORMATO, "versao": 0, "gerado_em": None, "tabelas": tabelas}
+
+
+def schema_para_texto(schema):
+    """
+    Serializa o schema no formato pseudo-JSON usado originalmente no prompt.
+
+    Args:
+        schema (dict): O schema no formato de snapshot.
+
+    Returns:
+        str: O schema em texto.
+    """
+    blocos = []
+    for nome, info in schema['tabelas'].items():
+        colunas = ",".join(json.dumps(coluna) for coluna, _ in info['colunas'])
+        relacionamentos = ",\n".join(
+            f'        {json.dumps(referencia.split(".")[0])}: "{referencia} = {nome}.{coluna}"'
+            for coluna, referencia in info['fks'].items()
+        )
+        relacionamentos = "{\n" + relacionamentos + "\n    }" if relacionamentos else "{}"
+        blocos.append(
+            f'{json.dumps(nome)}: {{\n'
+            f'    "descricao": {json.dumps(info["descricao"], ensure_ascii=False)},\n'
+            f'    "colunas": ({colunas}),\n'
+            f'    "relacionamentos": {relacionamentos}\n'
+            f'}},'
+        )
+    return "\n".join(blocos)
+
+
+def _descricao_compacta(nome, descricao):
+    # Remove o "Tabela de <nome>" redundante e mantém apenas a semântica extra
+    texto = re.sub(r"^Tabela\s+(de\s+)?'?" + re.escape(nome).replace('_', '[_ ]') + r"'?\s*", "", descricao, flags=re.IGNORECASE)
+    texto = re.sub(r"^\((.*?)\)", r"\1", texto.strip())
+    return texto.strip(" .")
+
+
+def schema_para_compacto(schema, incluir_auditoria=False):
+    """
+    Serializa o schema em um formato denso para o prompt, uma tabela por linha:
+    `tabela(col,col,...) fk:col->tabela_ref -- descrição`.
+
+    Tabelas com a mesma estrutura são agrupadas em uma linha só e as colunas de
+    auditoria viram um marcador no nome da tabela com a inicial de cada uma que a
+    tabela tem (`os*cd` tem created_at e deleted_at, mas não updated_at).
+
+    Args:
+        schema (dict): O schema no formato de snapshot.
+        incluir_auditoria (bool): Mantém created_at/updated_at/deleted_at nas colunas.
+
+    Returns:
+        str: O schema codificado.
+    """
+    linhas = {}
+    for nome, info in schema['tabelas'].items():
+        colunas = [coluna for coluna, _ in info['colunas']]
+        marcador = ""
+        if not incluir_auditoria:
+            iniciais = "".join(coluna[0] for coluna in COLUNAS_AUDITORIA if coluna in colunas)
+            marcador = f"*{iniciais}" if iniciais else ""
+            colunas = [coluna for coluna in colunas if coluna not in COLUNAS_AUDITORIA]
+
+        fks = []
+        for coluna, referencia in info['fks'].items():
+            tabela_ref, coluna_ref = referencia.split('.', 1)
+            fks.append(f"{coluna}->{tabela_ref}" if coluna_ref == 'id' else f"{coluna}->{referencia}")
+
+        corpo = f"({','.join(colunas)})"
+        if fks:
+            corpo += f" fk:{','.join(fks)}"
+        descricao = _descricao_compacta(nome, info.get('descricao', ''))
+        if descricao:
+            corpo += f" -- {descricao}"
+
+        # Estruturas idênticas (ex.: tabelas de status/tipos) compartilham a linha
+        linhas.setdefault(corpo, []).append(nome + marcador)
+
+    cabecalho = [] if incluir_auditoria else [
+        "*cud no nome = colunas de auditoria que a tabela tem: c=created_at, u=updated_at, d=deleted_at (soft delete)"
+    ]
+    return "\n".join(cabecalho + [f"{','.join(nomes)}{corpo}" for corpo, nomes in linhas.items()])
+
+
+def auditoria_relevante(pergunta):
+    """
+    Indica se a pergunta menciona criação, alteração ou exclusão de registros.
+    """
+    return bool(TERMOS_AUDITORIA.search(pergunta or ""))
+
+
+def codificar_schema(schema, codificacao="compacto", incluir_auditoria=False):
+    """
+    Serializa o schema na codificação pedida, reaproveitando o resultado entre requisições.
+
+    Args:
+        schema (dict): O schema no formato de snapshot.
+        codificacao (str): "compacto" ou "texto" (formato pseudo-JSON original).
+        incluir_auditoria (bool): Mantém as colunas de auditoria (apenas no formato compacto).
+
+    Returns:
+        str: O schema codificado.
+    """
+    if codificacao not in CODIFICACOES:
+        raise ValueError(f"Codificação de schema desconhecida: {codificacao}")
+
+    chave = (id(schema), codificacao, incluir_auditoria)
+    cache = _cache_codificacao.get(chave)
+    if cache is not None and cache[0] is schema:
+        return cache[1]
+
+    if codificacao == "compacto":
+        texto = schema_para_compacto(schema, incluir_auditoria)
+    else:
+        texto = schema_para_texto(schema)
+
+    _cache_codificacao[chave] = (schema, texto)
+    return texto
+
+
+def carregar_snapshot(caminho):
+    """
+    Carrega o snapshot do schema salvo em disco.
+
+    Args:
+        caminho (str): Caminho do arquivo de snapshot.
+
+    Returns:
+        dict | None: O schema, ou None se o arquivo não existir ou for de outro formato.
+    """
+    if not os.path.exists(caminho):
+        return None
+
+    with open(caminho, encoding='utf-8') as arquivo:
+        schema = json.load(arquivo)
+
+    if schema.get('formato') != SNAPSHOT_FORMATO:
+        return None
+    return schema
+
+
+def salvar_snapshot(schema, caminho):
+    """
+    Salva o snapshot do schema de forma atômica (escreve em arquivo temporário e renomeia).
+
+    Args:
+        schema (dict): O schema no formato de snapshot.
+        caminho (str): Caminho do arquivo de snapshot.
+    """
+    diretorio = os.path.dirname(caminho)
+    if diretorio and not os.path.exists(diretorio):
+        os.makedirs(diretorio)
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(schema, arquivo, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporario, caminho)
+
+
+def _filtro_tabelas(tabelas):
+    if not tabelas:
+        return "", ()
+    return f" AND TABLE_NAME IN ({', '.join(['%s'] * len(tabelas))})", tuple(tabelas)
+
+
+def calcular_checksums(cursor, banco):
+    """
+    Calcula um checksum por tabela a partir do information_schema.
+
+    Args:
+        cursor: Cursor MySQL em modo dicionário.
+        banco (str): Nome do banco de dados.
+
+    Returns:
+        dict: Mapeamento tabela -> checksum.
+    """
+    # O padrão de 1024 bytes truncaria o GROUP_CONCAT de tabelas grandes
+    cursor.execute("SET SESSION group_concat_max_len = 1048576")
+    cursor.execute(QUERY_CHECKSUM, (banco, banco, banco))
+
+    partes = {}
+    for linha in cursor.fetchall():
+        partes.setdefault(linha['tabela'], []).append(f"{linha['tipo']}:{linha['checksum']}")
+
+    return {
+        tabela: hashlib.md5("|".join(sorted(valores)).encode('utf-8')).hexdigest()
+        for tabela, valores in partes.items()
+    }
+
+
+def introspectar(cursor, banco, tabelas=None):
+    """
+    Lê tabelas, colunas, FKs e índices do information_schema.
+
+    Args:
+        cursor: Cursor MySQL em modo dicionário.
+        banco (str): Nome do banco de dados.
+        tabelas (list, optional): Restringe a leitura a estas tabelas.
+
+    Returns:
+        dict: Mapeamento tabela -> informações no formato de snapshot (sem checksum).
+    """
+    filtro, params = _filtro_tabelas(tabelas)
+    resultado = {}
+
+    cursor.execute(QUERY_TABELAS.format(filtro=filtro), (banco, *params))
+    for linha in cursor.fetchall():
+        resultado[linha['tabela']] = {
+            "descricao": linha['comentario'] or "",
+            "colunas": [],
+            "fks": {},
+            "indices": {},
+            "checksum": "",
+        }
+
+    cursor.execute(QUERY_COLUNAS.format(filtro=filtro), (banco, *params))
+    for linha in cursor.fetchall():
+        if linha['tabela'] in resultado:
+            resultado[linha['tabela']]['colunas'].append([linha['coluna'], linha['tipo']])
+
+    cursor.execute(QUERY_FKS.format(filtro=filtro), (banco, *params))
+    for linha in cursor.fetchall():
+        if linha['tabela'] in resultado:
+            resultado[linha['tabela']]['fks'][linha['coluna']] = f"{linha['tabela_ref']}.{linha['coluna_ref']}"
+
+    cursor.execute(QUERY_INDICES.format(filtro=filtro), (banco, *params))
+    for linha in cursor.fetchall():
+        if linha['tabela'] in resultado:
+            indice = resultado[linha['tabela']]['indices'].setdefault(
+                linha['indice'], {"colunas": [], "unico": not linha['nao_unico']}
+            )
+            indice['colunas'].append(linha['coluna'])
+
+    return resultado
+
+
+def atualizar_schema(schema):
+    """
+    Atualiza o schema de forma incremental: só relê as tabelas cujo checksum mudou.
+
+    Apenas as tabelas de SCHEMA_TABELAS (ou, sem ela, as que já estão no schema) são
+    consideradas: o schema estático é uma seleção curada, não o banco inteiro.
+
+    Args:
+        schema (dict): O schema atual (snapshot ou fallback estático).
+
+    Returns:
+        tuple: (schema atualizado, True se houve alteração).
+    """
+    banco = current_app.config['DB_NAME']
+    connection = conectar()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        atuais = schema['tabelas']
+        permitidas = set(current_app.config['SCHEMA_TABELAS'] or atuais)
+        checksums = {
+            tabela: checksum for tabela, checksum in calcular_checksums(cursor, banco).items()
+            if tabela in permitidas
+        }
+
+        alteradas = [
+            tabela for tabela, checksum in checksums.items()
+            if atuais.get(tabela, {}).get('checksum') != checksum
+        ]
+        removidas = [tabela for tabela in atuais if tabela not in checksums]
+
+        if not alteradas and not removidas:
+            return schema, False
+
+        novas = introspectar(cursor, banco, alteradas) if alteradas else {}
+        cursor.close()
+    finally:
+        connection.close()
+
+    tabelas = {nome: info for nome, info in atuais.items() if nome not in removidas}
+    for nome, info in novas.items():
+        # Mantém a descrição manual quando a tabela não tem comentário no banco
+        if not info['descricao'] and nome in atuais:
+            info['descricao'] = atuais[nome]['descricao']
+        # Sem FKs declaradas no banco, os relacionamentos manuais continuam valendo
+        if not info['fks'] and nome in atuais:
+            existentes = {coluna for coluna, _ in info['colunas']}
+            info['fks'] = {coluna: ref for coluna, ref in atuais[nome]['fks'].items() if coluna in existentes}
+        info['checksum'] = checksums[nome]
+        tabelas[nome] = info
+
+    current_app.logger.info(
+        f"Schema atualizado: {len(novas)} tabela(s) relida(s), {len(removidas)} removida(s)"
+    )
+    return {
+        "formato": SNAPSHOT_FORMATO,
+        "versao": schema.get('versao', 0) + 1,
+        "gerado_em": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "tabelas": dict(sorted(tabelas.items())),
+    }, True
+
+
+def _atualizar_e_salvar(app, schema):
+    try:
+        schema, alterado = atualizar_schema(schema)
+        if alterado:
+            salvar_snapshot(schema, app.config['SCHEMA_SNAPSHOT_PATH'])
+    except Exception as e:
+        app.logger.error(f"Erro ao atualizar o schema a partir do banco: {e}")
+    return schema
+
+
+@click.command('atualizar-schema')
+@with_appcontext
+def atualizar_schema_comando():
+    """Verifica o checksum do schema no banco e atualiza o snapshot."""
+    app = current_app._get_current_object()
+    schema = _atualizar_e_salvar(app, obter_schema())
+    app.extensions['schema'] = schema
+    click.echo(f"Schema na versão {schema['versao']} ({len(schema['tabelas'])} tabelas).")
+
+
+def init_schema(app):
+    """
+    Carrega o snapshot do schema na inicialização da aplicação.
+
+    Sem snapshot, parte do schema estático. Com banco configurado, verifica o
+    checksum e relê apenas as tabelas alteradas, salvando um novo snapshot.
+    """
+    schema = carregar_snapshot(app.config['SCHEMA_SNAPSHOT_PATH'])
+    if schema is None:
+        from ..schema_estatico import SCHEMA
+        schema = schema_de_texto(SCHEMA)
+
+    if app.config.get('DB_HOST') and app.config['SCHEMA_ATUALIZAR_NA_INICIALIZACAO']:
+        schema = _atualizar_e_salvar(app, schema)
+
+    app.extensions['schema'] = schema
+    app.cli.add_command(atualizar_schema_comando)
+
+
+def obter_schema():
+    """
+    Retorna o schema carregado na inicialização da aplicação.
+    """
+    return current_app.extensions['schema']
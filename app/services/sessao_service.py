@@ -0,0 +1,421 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from datetime import time as hora
+from decimal import Decimal
+from flask import current_app
+from .db_service import validar_seguranca
+from .exemplos_service import tokenizar
+from .metricas_service import registrar
+from .openai_service import ErroTraducao, gerar_query_local
+
+# Tabela consultada pelos refinamentos e a tabela com a posição de cada linha no resultado original
+TABELA_LOCAL = "resultado"
+TABELA_POSICOES = "_resultado"
+
+# Linhas do resultado enviadas como amostra no prompt de refinamento
+AMOSTRA_PROMPT = 3
+
+# Prazo de uma consulta no SQLite local, para que um refinamento mal traduzido não trave a requisição
+PRAZO_CONSULTA_LOCAL = 2.0
+
+# Perguntas que continuam a anterior: começam com um marcador ou se referem ao resultado.
+# Só os verbos de ordenação contam ("ordens de serviço" é uma pergunta nova), e
+# "anterior"/"acima" só junto do resultado ("mês anterior" também é).
+PADRAO_REFINAMENTO = re.compile(
+    r"^(?:agora|e|so|apenas|somente|top|filtr\w*|dentre|mostre so|mostre apenas)\b"
+    r"|^(?:orden(?:e|a|ar|ad[oa]s?)|classifi(?:que|ca|car|cad[oa]s?))\b"
+    r"|\b(?:desses|destes|deles|delas|nesses|nestes)\b"
+    r"|\b(?:resultados?|lista|tabela|consulta|pergunta)\s+(?:acima|anterior)\b"
+)
+
+# Falhas da tradução local que ainda confirmam que a pergunta refina a anterior:
+# o modelo respondeu NAO_LOCAL porque faltam colunas, e não NOVA_PERGUNTA
+MOTIVOS_REFINAMENTO = {"nao_local"}
+
+# Regras resolvidas sem LLM, sobre o texto sem acentos e em minúsculas
+PADRAO_TOP = re.compile(
+    r"\b(?:top\s*(\d+)|(?:os|as)?\s*(\d+)\s+(maiores|melhores|menores|piores|primeir[oa]s|ultim[oa]s))\b"
+)
+PADRAO_ORDEM = re.compile(
+    r"\b(?:orden\w*|classifi\w*)\s+(?:por|pelo|pela|pelos|pelas)\s+(.+?)(?:\s+(crescente|decrescente|asc|desc))?"
+    r"(?=\s*(?:[,;]|\be\b|\bso\b|\bapenas\b|\bsomente\b|\btop\b|$))"
+)
+PADRAO_FILTRO = re.compile(
+    r"\b(?:so|apenas|somente)\s+(?:(?:o|a|os|as|do|da|dos|das|de|no|na|nos|nas|com)\s+)?(.+?)"
+    r"(?=\s*(?:[,;]|\borden\w*|\bclassifi\w*|\btop\b|$))"
+)
+
+# Palavras que podem sobrar em um refinamento coberto pelas regras ("agora mostre só ...")
+PALAVRAS_VAZIAS_REFINAMENTO = set(tokenizar(
+    "agora entao e mostre mostra exiba traga quero ver so apenas somente resultado resultados linhas lista"
+))
+
+
+def normalizar_texto(texto):
+    """
+    Remove acentos, espaços nas pontas e pontuação final, e converte para minúsculas.
+    """
+    texto = unicodedata.normalize('NFKD', str(texto).lower()).encode('ascii', 'ignore').decode('ascii')
+    return texto.strip().rstrip('?.!').strip()
+
+
+def estimar_bytes(linhas):
+    """
+    Estima a memória ocupada por uma lista de linhas (dicionários) do cursor.
+    """
+    if not linhas:
+        return 0
+    # As chaves são os mesmos objetos em todas as linhas: contadas uma vez
+    total = sum(sys.getsizeof(coluna) for coluna in linhas[0])
+    for linha in linhas:
+        total += sys.getsizeof(linha) + sum(sys.getsizeof(valor) for valor in linha.values())
+    return total
+
+
+class ArmazemResultados:
+    """
+    Último resultado de cada sessão, mantido em memória para responder refinamentos.
+    Também serve de cache das respostas por pergunta, com a pergunta normalizada como chave.
+
+    Limitado pelo total estimado de bytes (`memoria_maxima`): ao passar do limite, as
+    sessões usadas há mais tempo saem primeiro. Resultados sem uso há mais de `ttl`
+    segundos expiram, e resultados com mais de `max_linhas` linhas não são guardados.
+    """
+    def __init__(self, memoria_maxima, ttl, max_linhas):
+        self.memoria_maxima = memoria_maxima
+        self.ttl = ttl
+        self.max_linhas = max_linhas
+        self._lock = threading.Lock()
+        self._sessoes = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._sessoes)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def _remover(self, sessao_id):
+        resultado = self._sessoes.pop(sessao_id, None)
+        if resultado is not None:
+            self._bytes -= resultado['bytes']
+
+    def _despejar(self):
+        # A ordem do OrderedDict é a do uso: a primeira sessão é a menos recente
+        agora = time.time()
+        while self._sessoes:
+            sessao_id, resultado = next(iter(self._sessoes.items()))
+            if self._bytes <= self.memoria_maxima and agora - resultado['ultimo_uso'] <= self.ttl:
+                break
+            self._remover(sessao_id)
+
+    def guardar(self, sessao_id, pergunta, query, linhas):
+        """
+        Substitui o resultado da sessão.
+
+        Returns:
+            bool: Se o resultado foi guardado (vazio ou grande demais não é).
+        """
+        tamanho = estimar_bytes(linhas) if 0 < len(linhas) <= self.max_linhas else None
+        with self._lock:
+            self._remover(sessao_id)
+            if tamanho is None or tamanho > self.memoria_maxima:
+                return False
+            self._sessoes[sessao_id] = {
+                "id": uuid.uuid4().hex,
+                "pergunta": pergunta,
+                "query": query,
+                "linhas": linhas,
+                "bytes": tamanho,
+                "criado_em": time.time(),
+                "ultimo_uso": time.time(),
+            }
+            self._bytes += tamanho
+            self._despejar()
+            return sessao_id in self._sessoes
+
+    def obter(self, sessao_id):
+        """
+        Retorna o último resultado da sessão, ou None se não houver ou se expirou.
+        """
+        with self._lock:
+            self._despejar()
+            resultado = self._sessoes.get(sessao_id)
+            if resultado is None:
+                return None
+            self._sessoes.move_to_end(sessao_id)
+            resultado['ultimo_uso'] = time.time()
+            return resultado
+
+
+def _valor_sqlite(valor):
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime, hora)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return str(valor)
+    return valor
+
+
+def tipos_colunas(linhas):
+    """
+    Infere o tipo SQLite (INTEGER, REAL ou TEXT) de cada coluna pelo primeiro valor não nulo.
+    """
+    tipos = {}
+    for coluna in linhas[0]:
+        valor = next((linha[coluna] for linha in linhas if linha.get(coluna) is not None), None)
+        if isinstance(valor, (int, bool)):
+            tipos[coluna] = "INTEGER"
+        elif isinstance(valor, (float, Decimal)):
+            tipos[coluna] = "REAL"
+        else:
+            tipos[coluna] = "TEXT"
+    return tipos
+
+
+def _identificador(coluna):
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+def carregar_local(linhas):
+    """
+    Carrega as linhas em um SQLite em memória, consultável pela view `resultado`.
+
+    A tabela por trás da view guarda também a posição (`_linha`) de cada linha na lista
+    original, para que filtros e ordenações devolvam as linhas com os tipos do MySQL
+    (Decimal, datas) em vez dos convertidos para o SQLite.
+    """
+    conexao = sqlite3.connect(':memory:', isolation_level=None)
+    conexao.create_function("normalizar", 1, lambda valor: None if valor is None else normalizar_texto(valor))
+    tipos = tipos_colunas(linhas)
+    colunas = list(tipos)
+    definicao = ", ".join(f"{_identificador(coluna)} {tipo}" for coluna, tipo in tipos.items())
+    conexao.execute(f'CREATE TABLE {TABELA_POSICOES} (_linha INTEGER, {definicao})')
+    conexao.execute(
+        f'CREATE VIEW {TABELA_LOCAL} AS SELECT {", ".join(_identificador(c) for c in colunas)} FROM {TABELA_POSICOES}'
+    )
+    marcadores = ", ".join("?" * (len(colunas) + 1))
+    conexao.executemany(
+        f'INSERT INTO {TABELA_POSICOES} VALUES ({marcadores})',
+        ((indice, *(_valor_sqlite(linha.get(coluna)) for coluna in colunas)) for indice, linha in enumerate(linhas)),
+    )
+    return conexao
+
+
+def _coluna_mais_parecida(texto, colunas):
+    tokens = set(tokenizar(texto))
+    pontuacoes = [(len(tokens & set(tokenizar(coluna.replace('_', ' ')))), coluna) for coluna in colunas]
+    pontuacao, coluna = max(pontuacoes, key=lambda item: item[0])
+    return coluna if pontuacao else None
+
+
+def _condicao_filtro(conexao, valor, colunas_texto):
+    # Igualdade exata tem prioridade sobre "contém" em qualquer coluna de texto
+    literal = "'" + valor.replace("'", "''") + "'"
+    for condicao in ("normalizar({coluna}) = {literal}", "normalizar({coluna}) LIKE '%' || {literal} || '%'"):
+        for coluna in colunas_texto:
+            sql = condicao.format(coluna=_identificador(coluna), literal=literal)
+            if conexao.execute(f"SELECT 1 FROM {TABELA_POSICOES} WHERE {sql} LIMIT 1").fetchone():
+                return sql
+    return None
+
+
+def refinar_por_regras(conexao, linhas, pergunta):
+    """
+    Traduz refinamentos simples sem LLM: "top 10", "os 5 menores", "ordene por lucro",
+    "agora só oficina" (e combinações deles).
+
+    Returns:
+        str | None: As cláusulas após `FROM resultado` (WHERE/ORDER BY/LIMIT), ou None se
+            alguma parte da pergunta não for coberta pelas regras.
+    """
+    texto = normalizar_texto(pergunta)
+    tipos = tipos_colunas(linhas)
+    numericas = [coluna for coluna, tipo in tipos.items() if tipo != "TEXT"]
+    colunas_texto = [coluna for coluna, tipo in tipos.items() if tipo == "TEXT"]
+    cobertos = []
+    condicoes = []
+    ordem = None
+
+    match_ordem = PADRAO_ORDEM.search(texto)
+    if match_ordem:
+        coluna = _coluna_mais_parecida(match_ordem.group(1), list(tipos))
+        if coluna is None:
+            return None
+        direcao = match_ordem.group(2)
+        crescente = direcao in ("crescente", "asc") or (direcao is None and tipos[coluna] == "TEXT")
+        ordem = f"{_identificador(coluna)} {'ASC' if crescente else 'DESC'}"
+        cobertos.append(match_ordem.span())
+
+    match_top = PADRAO_TOP.search(texto)
+    if match_top:
+        cobertos.append(match_top.span())
+
+    match_filtro = PADRAO_FILTRO.search(texto)
+    if match_filtro:
+        condicao = _condicao_filtro(conexao, match_filtro.group(1), colunas_texto)
+        if condicao is None:
+            return None
+        condicoes.append(condicao)
+        cobertos.append(match_filtro.span())
+
+    if not cobertos:
+        return None
+    restante = texto
+    for inicio, fim in sorted(cobertos, reverse=True):
+        restante = restante[:inicio] + " " + restante[fim:]
+    # Sobras só podem ser palavras vazias ou nomes de colunas ("top 10 vendedores por lucro")
+    tokens_colunas = {token for coluna in tipos for token in tokenizar(coluna.replace('_', ' '))}
+    if set(tokenizar(restante)) - PALAVRAS_VAZIAS_REFINAMENTO - tokens_colunas:
+        return None
+
+    limite = None
+    if match_top:
+        limite = int(match_top.group(1) or match_top.group(2))
+        tipo_top = match_top.group(3) or "maiores"
+        if tipo_top.startswith("ultim"):
+            ordem = "_linha DESC"
+        elif ordem is None and not tipo_top.startswith("primeir"):
+            coluna = _coluna_mais_parecida(restante, numericas) if numericas else None
+            coluna = coluna or (numericas[0] if numericas else None)
+            if coluna is None:
+                return None
+            ordem = f"{_identificador(coluna)} {'ASC' if tipo_top in ('menores', 'piores') else 'DESC'}"
+
+    clausulas = []
+    if condicoes:
+        clausulas.append("WHERE " + " AND ".join(condicoes))
+    clausulas.append(f"ORDER BY {ordem or '_linha'}")
+    if limite is not None:
+        clausulas.append(f"LIMIT {limite}")
+    return " ".join(clausulas)
+
+
+def _consultar(conexao, sql):
+    limite = time.perf_counter() + PRAZO_CONSULTA_LOCAL
+    conexao.set_progress_handler(lambda: time.perf_counter() > limite, 10000)
+    cursor = conexao.execute(sql)
+    colunas = [descricao[0] for descricao in cursor.description]
+    return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+
+def eh_refinamento(pergunta):
+    """
+    Indica se a pergunta parece continuar a anterior ("agora só oficina", "top 10").
+    Perguntas curtas sem marcador ("Faturamento de 2024") são tratadas como novas.
+    """
+    return bool(PADRAO_REFINAMENTO.search(normalizar_texto(pergunta)))
+
+
+def responder_localmente(anterior, pergunta):
+    """
+    Responde um refinamento a partir do último resultado da sessão, sem acessar o MySQL:
+    primeiro pelas regras e, se elas não cobrem a pergunta, pelo nível de modelo mais rápido.
+
+    Args:
+        anterior (dict): O resultado guardado da sessão ("pergunta", "linhas").
+        pergunta (str): O refinamento.
+
+    Returns:
+        tuple: (resposta, refinamento). A resposta tem "query", "resultados" e "nivel"
+            ("local"), ou é None quando o resultado guardado não basta e a pergunta
+            precisa ir ao MySQL. `refinamento` indica se as regras ou o modelo
+            confirmaram que a pergunta continua a anterior; se não, ela é uma pergunta nova.
+    """
+    linhas = anterior['linhas']
+    inicio = time.perf_counter()
+    conexao = carregar_local(linhas)
+    try:
+        clausulas = refinar_por_regras(conexao, linhas, pergunta)
+        if clausulas is not None:
+            selecionadas = _consultar(conexao, f"SELECT _linha FROM {TABELA_POSICOES} {clausulas}")
+            registrar("sessao", "regras", time.perf_counter() - inicio, True)
+            return {
+                "query": f"SELECT * FROM {TABELA_LOCAL} {clausulas}",
+                "resultados": [linhas[linha['_linha']] for linha in selecionadas],
+                "nivel": "local",
+            }, True
+
+        nivel = current_app.config['LLM_NIVEIS'][0]
+        tabela = {
+            "colunas": tipos_colunas(linhas),
+            "amostra": linhas[:AMOSTRA_PROMPT],
+            "total": len(linhas),
+        }
+        try:
+            query = gerar_query_local(tabela, anterior['pergunta'], pergunta, nivel['modelo'], nivel['temperatura'])
+        except ErroTraducao as e:
+            current_app.logger.info(f"Refinamento não respondido localmente: {e}")
+            registrar("sessao", "llm", time.perf_counter() - inicio, False, e.motivo)
+            return None, e.motivo in MOTIVOS_REFINAMENTO
+
+        erro = validar_seguranca(query)
+        if erro is None:
+            try:
+                resultados = _consultar(conexao, query)
+            except sqlite3.Error as e:
+                erro = str(e)
+        if erro:
+            current_app.logger.info(f"Query local rejeitada ({erro}): {query}")
+            registrar("sessao", "llm", time.perf_counter() - inicio, False, "sqlite")
+            # O modelo escreveu uma query sobre o resultado: a pergunta é um refinamento
+            return None, True
+
+        registrar("sessao", "llm", time.perf_counter() - inicio, True)
+        return {"query": query, "resultados": resultados, "nivel": "local"}, True
+    finally:
+        conexao.close()
+
+
+def init_sessoes(app):
+    """
+    Cria o armazém de resultados por sessão com os limites da configuração.
+    """
+    app.extensions['sessoes'] = ArmazemResultados(
+        app.config['SESSAO_MEMORIA_MB'] * 1024 * 1024,
+        app.config['SESSAO_TTL'],
+        app.config['SESSAO_MAX_LINHAS'],
+    )
+    # O mesmo armazém, indexado pela pergunta, guarda a última resposta de cada pergunta
+    app.extensions['respostas'] = ArmazemResultados(
+        app.config['RESPOSTAS_CACHE_MB'] * 1024 * 1024,
+        app.config['RESPOSTAS_CACHE_TTL'],
+        app.config['SESSAO_MAX_LINHAS'],
+    )
+
+
+def obter_resultado(sessao_id):
+    return current_app.extensions['sessoes'].obter(sessao_id)
+
+
+def guardar_resultado(sessao_id, pergunta, query, linhas):
+    return current_app.extensions['sessoes'].guardar(sessao_id, pergunta, query, linhas)
+
+
+def _chave_resposta(pergunta):
+    return " ".join(normalizar_texto(pergunta).split())
+
+
+def guardar_resposta(pergunta, query, linhas):
+    """
+    Guarda a resposta bem-sucedida da pergunta, servida se o LLM ou o banco ficarem indisponíveis.
+    """
+    return current_app.extensions['respostas'].guardar(_chave_resposta(pergunta), pergunta, query, linhas)
+
+
+def obter_resposta(pergunta):
+    """
+    Retorna a última resposta guardada para a pergunta (ignorando acentos e caixa), ou None.
+    """
+    return current_app.extensions['respostas'].obter(_chave_resposta(pergunta))
@@ -0,0 +1,82 @@
+"""
+Benchmark da serialização JSON e do tamanho transferido em resultados grandes.
+
+Compara o provider padrão do Flask com o `ORJSONProvider` na serialização de
+linhas parecidas com as do MySQL (Decimal, datetime, texto) e mede o tamanho e o
+tempo da compressão gzip e brotli (quando instalado) do corpo gerado.
+
+Uso:
+    python benchmarks/bench_json.py [quantidade_de_linhas]
+"""
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.json_provider import ORJSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def gerar_linhas(quantidade):
+    inicio = datetime(2024, 1, 1, 8, 0)
+    departamentos = ["oficina", "veículos usados", "funilaria", "estética"]
+    return [
+        {
+            "os_id": 100000 + i,
+            "vendedor_nome": f"Vendedor {i % 37}",
+            "departamento": departamentos[i % len(departamentos)],
+            "servico_nome": f"Serviço {i % 211}",
+            "quantidade_vendida": i % 13,
+            "valor_venda": Decimal(f"{(i * 37) % 9000}.{i % 100:02d}"),
+            "lucro": Decimal(f"{(i * 11) % 3000}.{(i * 7) % 100:02d}"),
+            "data_pagamento": inicio + timedelta(minutes=17 * i),
+        }
+        for i in range(quantidade)
+    ]
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    app = Flask(__name__)
+    linhas = gerar_linhas(quantidade)
+    repeticoes = 5
+
+    print(f"{quantidade} linhas")
+    print(f"{'provider':<12}{'ms':>10}{'bytes':>14}")
+    corpo = None
+    for rotulo, provider in (("padrao", DefaultJSONProvider(app)), ("orjson", ORJSONProvider(app))):
+        with app.app_context():
+            resposta, ms = medir(lambda: provider.response({"linhas": linhas}).get_data(), repeticoes)
+        print(f"{rotulo:<12}{ms:>10.1f}{len(resposta):>14}")
+        corpo = resposta
+
+    print(f"\n{'compressão':<16}{'ms':>10}{'bytes':>14}{'vs sem':>10}")
+    variantes = [("gzip nível 6", lambda: gzip.compress(corpo, 6))]
+    if brotli is not None:
+        variantes.append(("brotli q5", lambda: brotli.compress(corpo, quality=5)))
+    else:
+        print("(brotli não instalado: pip install brotli)")
+    for rotulo, comprimir in variantes:
+        comprimido, ms = medir(comprimir, repeticoes)
+        print(f"{rotulo:<16}{ms:>10.1f}{len(comprimido):>14}{len(comprimido) / len(corpo):>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
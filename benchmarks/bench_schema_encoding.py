@@ -0,0 +1,59 @@
+"""
+Benchmark de tokens do schema enviado no prompt.
+
+Compara o SCHEMA original (pseudo-JSON) com as codificações de
+`schema_service.codificar_schema`. Usa o tiktoken (o200k_base, tokenizer do
+gpt-4o) quando instalado; caso contrário, faz uma estimativa por palavras e
+pontuação.
+
+Uso:
+    python benchmarks/bench_schema_encoding.py [caminho_do_snapshot.json]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schema_estatico import SCHEMA
+from app.services.schema_service import carregar_snapshot, codificar_schema, schema_de_texto
+
+
+def contador_de_tokens():
+    try:
+        import tiktoken
+        codificador = tiktoken.get_encoding("o200k_base")
+        return "tiktoken/o200k_base", lambda texto: len(codificador.encode(texto))
+    except ImportError:
+        return "estimativa (palavras + pontuação)", lambda texto: len(re.findall(r"\w+|[^\w\s]", texto))
+
+
+def main():
+    schema = carregar_snapshot(sys.argv[1]) if len(sys.argv) > 1 else None
+    if schema is None:
+        schema = schema_de_texto(SCHEMA)
+
+    nome, contar = contador_de_tokens()
+    base = contar(SCHEMA)
+    variantes = [
+        ("SCHEMA original", SCHEMA),
+        ("texto", codificar_schema(schema, "texto")),
+        ("compacto", codificar_schema(schema, "compacto")),
+        ("compacto + auditoria", codificar_schema(schema, "compacto", incluir_auditoria=True)),
+    ]
+
+    print(f"Tokenizer: {nome}")
+    print(f"{'codificação':<24}{'caracteres':>12}{'tokens':>10}{'vs original':>14}")
+    for rotulo, texto in variantes:
+        tokens = contar(texto)
+        print(f"{rotulo:<24}{len(texto):>12}{tokens:>10}{tokens / base:>13.0%}")
+
+    inicio = time.perf_counter()
+    for _ in range(100):
+        codificar_schema(schema_de_texto(SCHEMA), "compacto")
+    print(f"\nparse + codificação compacta sem cache: {(time.perf_counter() - inicio) * 10:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark do tempo de inicialização a frio da aplicação.
+
+Cada medição roda em um interpretador novo, para que nenhum módulo já esteja
+importado: mede o `create_app()` (o que cada teste e cada processo de
+desenvolvimento pagam) e o `preaquecer()` (feito uma vez no processo principal do
+gunicorn, antes do fork), e lista quais módulos pesados foram carregados.
+
+Uso:
+    python benchmarks/bench_startup.py [repeticoes]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+from app import create_app, preaquecer
+app = create_app()
+criacao = time.perf_counter() - inicio
+pesados = [m for m in ("openai", "mysql.connector") if m in sys.modules]
+inicio = time.perf_counter()
+preaquecer(app)
+print(json.dumps({"criacao": criacao, "preaquecer": time.perf_counter() - inicio, "pesados": pesados}))
+"""
+
+
+def medir():
+    saida = subprocess.run(
+        [sys.executable, "-c", MEDICAO], cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    medicoes = [medir() for _ in range(repeticoes)]
+
+    print(f"{repeticoes} inicializações a frio")
+    for campo, descricao in (("criacao", "create_app()"), ("preaquecer", "preaquecer()")):
+        tempos = [m[campo] * 1000 for m in medicoes]
+        print(f"{descricao:<15} mediana {statistics.median(tempos):8.1f} ms   máximo {max(tempos):8.1f} ms")
+    print(f"módulos pesados carregados pelo create_app(): {', '.join(medicoes[0]['pesados']) or 'nenhum'}")
+
+
+if __name__ == '__main__':
+    main()
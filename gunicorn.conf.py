@@ -0,0 +1,33 @@
+"""
+Configuração do gunicorn para produção (`gunicorn -c gunicorn.conf.py wsgi:app`).
+
+Com `preload_app`, a aplicação, o schema codificado e os templates de prompt são
+carregados uma vez no processo principal e herdados pelos workers no fork.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Cada requisição espera pelo modelo e pelo banco: threads atendem outras enquanto isso
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = True
+# Acima do prazo de uma chamada ao modelo (LLM_PRAZO) somado à escalada para o nível grande
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    # O worker redefine os sinais ao iniciar: o sinal do perfilador é reinstalado em cada um.
+    # Envie-o ao pid do worker, não ao processo principal (que usa o SIGUSR2 para upgrade).
+    from app.services.perfil_service import instalar_sinal_perfil
+
+    instalar_sinal_perfil(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # Grava os exemplos aprendidos que ainda aguardavam o intervalo de gravação
+    from app.services.exemplos_service import descarregar_exemplos
+
+    descarregar_exemplos(worker.wsgi)
@@ -1,6 +1,8 @@
+import os
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Servidor de desenvolvimento; em produção use o gunicorn (wsgi.py)
+    app.run(debug=os.getenv('FLASK_DEBUG', 'false').lower() == 'true')
@@ -0,0 +1,81 @@
+import gzip
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from flask import jsonify
+from app import create_app
+
+LINHAS = [
+    {"id": i, "valor": Decimal("1234.50"), "data": datetime(2024, 12, 1, 10, 30), "nome": f"Cliente {i}"}
+    for i in range(200)
+]
+
+class TestCompressao(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.add_url_rule('/teste/linhas', 'teste_linhas', lambda: jsonify(linhas=LINHAS))
+        self.app.add_url_rule('/teste/pequena', 'teste_pequena', lambda: jsonify(ok=True))
+        self.cliente = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+
+    def test_provider_serializa_tipos_do_mysql(self):
+        texto = self.app.json.dumps({
+            "valor": Decimal("10.10"),
+            "dia": date(2024, 12, 1),
+            "momento": datetime(2024, 12, 1, 8, 5),
+            "hora": timedelta(hours=2, minutes=3),
+            "texto": b"oficina",
+            "binario": b"\xff\x00",
+            2024: "ano",
+        })
+        self.assertEqual(self.app.json.loads(texto), {
+            "valor": "10.10",
+            "dia": "2024-12-01",
+            "momento": "2024-12-01T08:05:00",
+            "hora": "2:03:00",
+            "texto": "oficina",
+            "binario": "/wA=",
+            "2024": "ano",
+        })
+
+    def test_gzip_negociado(self):
+        resposta = self.cliente.get('/teste/linhas', headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(resposta.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resposta.headers["Vary"])
+        corpo = self.app.json.loads(gzip.decompress(resposta.get_data()))
+        self.assertEqual(corpo["linhas"][0]["valor"], "1234.50")
+
+    def test_brotli_preferido_quando_disponivel(self):
+        try:
+            import brotli
+        except ImportError:
+            self.skipTest("brotli não instalado")
+        resposta = self.cliente.get('/teste/linhas', headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(resposta.headers["Content-Encoding"], "br")
+        self.assertEqual(len(self.app.json.loads(brotli.decompress(resposta.get_data()))["linhas"]), 200)
+
+        resposta = self.cliente.get('/teste/linhas', headers={"Accept-Encoding": "gzip, br;q=0.5"})
+        self.assertEqual(resposta.headers["Content-Encoding"], "gzip")
+
+    def test_sem_compressao(self):
+        resposta = self.cliente.get('/teste/linhas')
+        self.assertNotIn("Content-Encoding", resposta.headers)
+
+        resposta = self.cliente.get('/teste/pequena', headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", resposta.headers)
+        self.assertEqual(resposta.get_json(), {"ok": True})
+
+    @patch('app.compressao.brotli', None)
+    def test_gzip_sem_brotli_instalado(self):
+        resposta = self.cliente.get('/teste/linhas', headers={"Accept-Encoding": "br, gzip;q=0.1"})
+        self.assertEqual(resposta.headers["Content-Encoding"], "gzip")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,9 @@
 import unittest
 from unittest.mock import patch
 from app import create_app
-from app.services.db_service import executar_query
+from decimal import Decimal
+from mysql.connector import Error
+from app.services.db_service import executar_query, parametrizar_query, validar_query
 
 class TestDBService(unittest.TestCase):
     def setUp(self):
@@ -15,7 +17,7 @@ class TestDBService(unittest.TestCase):
         # Remover o contexto após o teste
         self.app_context.pop()
 
-    @patch('app.services.db_service.mysql.connector.connect')
+    @patch('mysql.connector.connect')
     def test_executar_query_select(self, mock_connect):
         mock_conn = mock_connect.return_value
         mock_cursor = mock_conn.cursor.return_value
@@ -26,11 +28,146 @@ class TestDBService(unittest.TestCase):
         resultados = executar_query(query)
         self.assertEqual(resultados, [{'id': 1, 'nome': 'João'}])
 
-    @patch('app.services.db_service.mysql.connector.connect')
+    @patch('mysql.connector.connect')
     def test_executar_query_non_select(self, mock_connect):
         query = "DELETE FROM clientes WHERE id=1;"
         resultados = executar_query(query)
         self.assertEqual(resultados, "Somente queries SELECT são permitidas para segurança.")
 
+    @patch('mysql.connector.connect')
+    def test_executar_query_reutiliza_conexao_do_pool(self, mock_connect):
+        mock_conn = mock_connect.return_value
+        mock_conn.cursor.return_value.fetchall.return_value = []
+        mock_conn.is_connected.return_value = True
+
+        executar_query("SELECT * FROM clientes;")
+        executar_query("SELECT * FROM clientes;")
+
+        self.assertEqual(mock_connect.call_count, 1)
+        mock_conn.close.assert_not_called()
+
+    def test_parametrizar_query(self):
+        template, params = parametrizar_query(
+            "SELECT d.nome, 'x' AS tipo FROM os JOIN departamentos d ON d.id = os.departamento_id AND os.paga = 1 "
+            "WHERE d.nome = 'oficina' AND os.data_pagamento BETWEEN '2024-12-01' AND '2024-12-31' "
+            "AND os.valor > 10.5 AND c.nome = 'D''Ávila' GROUP BY 1 ORDER BY 2 DESC LIMIT 10;"
+        )
+        self.assertEqual(
+            template,
+            "SELECT d.nome, 'x' AS tipo FROM os JOIN departamentos d ON d.id = os.departamento_id AND os.paga = %s "
+            "WHERE d.nome = %s AND os.data_pagamento BETWEEN %s AND %s "
+            "AND os.valor > %s AND c.nome = %s GROUP BY 1 ORDER BY 2 DESC LIMIT 10;",
+        )
+        self.assertEqual(params, (1, 'oficina', '2024-12-01', '2024-12-31', Decimal('10.5'), "D'Ávila"))
+
+    def test_parametrizar_query_mantem_constantes_exigidas(self):
+        query = (
+            "SELECT id FROM os WHERE CAST(valor AS DECIMAL(10,2)) > 5 AND data >= DATE '2024-01-01' "
+            "AND nome LIKE 'a\\_b' AND dados->'$.tipo' = 'x'"
+        )
+        template, params = parametrizar_query(query)
+        self.assertIn("DECIMAL(10,2)", template)
+        self.assertIn("DATE '2024-01-01'", template)
+        self.assertIn("'a\\_b'", template)
+        self.assertIn("->'$.tipo'", template)
+        self.assertEqual(params, (5, 'x'))
+
+    @patch('mysql.connector.connect')
+    def test_executar_query_reaproveita_statement_preparado(self, mock_connect):
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchall.return_value = []
+        mock_conn.is_connected.return_value = True
+
+        executar_query("SELECT id FROM os WHERE data_pagamento >= '2024-12-01'")
+        executar_query("SELECT id FROM os WHERE data_pagamento >= '2025-01-01'")
+
+        mock_conn.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        primeira, segunda = mock_cursor.execute.call_args_list
+        self.assertIs(primeira.args[0], segunda.args[0])
+        self.assertEqual(segunda.args, ("SELECT id FROM os WHERE data_pagamento >= %s", ('2025-01-01',)))
+        mock_cursor.close.assert_not_called()
+
+    @patch('mysql.connector.connect')
+    def test_executar_query_descarta_statement_com_erro(self, mock_connect):
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.execute.side_effect = [Error("Unknown column 'x'"), None]
+        mock_cursor.fetchall.return_value = [{'id': 1}]
+        mock_conn.is_connected.return_value = True
+
+        self.assertIn("Unknown column", executar_query("SELECT x FROM os WHERE id = 1"))
+        mock_cursor.close.assert_called_once()
+        self.assertEqual(executar_query("SELECT x FROM os WHERE id = 2"), [{'id': 1}])
+        self.assertEqual(mock_conn.cursor.call_count, 2)
+
+    @patch('mysql.connector.connect')
+    def test_executar_query_sem_preparadas(self, mock_connect):
+        self.app.config['DB_PREPARADAS_MAX'] = 0
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchall.return_value = []
+        mock_conn.is_connected.return_value = True
+
+        executar_query("SELECT id FROM os WHERE id = 1")
+
+        mock_conn.cursor.assert_called_once_with(dictionary=True)
+        mock_cursor.execute.assert_called_once_with("SELECT id FROM os WHERE id = 1", None)
+        mock_cursor.close.assert_called_once()
+
+    @patch('mysql.connector.connect')
+    def test_validar_query_aceita_query_valida(self, mock_connect):
+        query = """
+            SELECT f.nome AS vendedor, SUM(osv.valor_venda) AS total
+            FROM os
+            JOIN os_servicos osv ON os.id = osv.os_id
+            JOIN funcionarios f ON f.id = os.vendedor_id
+            WHERE os.data_pagamento >= DATE_SUB(CURDATE(), INTERVAL 1 MONTH)
+            GROUP BY f.nome WITH ROLLUP;
+        """
+        self.assertIsNone(validar_query(query))
+        mock_connect.assert_not_called()
+
+    def test_validar_query_coluna_desconhecida(self):
+        erro = validar_query("SELECT o.valor_total FROM os o JOIN os_servicos osv ON osv.os_id = o.id")
+        self.assertEqual(erro['tipo'], "coluna_desconhecida")
+        self.assertEqual(erro['identificador'], "o.valor_total")
+        self.assertEqual(erro['tabela'], "os")
+
+    def test_validar_query_tabela_desconhecida(self):
+        erro = validar_query("SELECT id FROM servico")
+        self.assertEqual(erro['tipo'], "tabela_desconhecida")
+        self.assertIn("servicos", erro['sugestoes'])
+
+    def test_validar_query_sintaxe(self):
+        # Por padrão o erro de sintaxe do espelho só vai para o log
+        self.assertIsNone(validar_query("SELECT FROM os"))
+        self.app.config['VALIDACAO_REJEITAR_SINTAXE'] = True
+        self.assertEqual(validar_query("SELECT FROM os")['tipo'], "sintaxe")
+        self.assertEqual(validar_query("SELECT id FROM os; SELECT id FROM os")['tipo'], "sintaxe")
+
+    def test_validar_query_aceita_construcoes_do_mysql(self):
+        self.app.config['VALIDACAO_REJEITAR_SINTAXE'] = True
+        consultas = [
+            "SELECT GROUP_CONCAT(DISTINCT s.nome ORDER BY s.nome SEPARATOR ', ') FROM servicos s",
+            "SELECT id FROM os WHERE data_pagamento >= TIMESTAMP '2024-01-01 00:00:00' AND data_pagamento < DATE '2025-01-01'",
+            "SELECT id FROM os WHERE ISNULL(data_pagamento)",
+            "SELECT id FROM os WHERE cliente_id <=> NULL",
+            "SELECT STRAIGHT_JOIN os.id FROM os STRAIGHT_JOIN clientes c ON c.id = os.cliente_id",
+            "SELECT o.id FROM os o FORCE INDEX (PRIMARY) WHERE o.id > 10",
+            "SELECT id FROM os WHERE cliente_id = ANY (SELECT id FROM clientes)",
+            "SELECT TRIM(LEADING 'x' FROM s.nome) FROM servicos s",
+            "SELECT CONVERT(id, CHAR), CONVERT(s.nome USING utf8mb4) FROM servicos s",
+            "SELECT s.id FROM servicos s WHERE MATCH (s.nome) AGAINST ('polimento' IN BOOLEAN MODE)",
+            "SELECT POSITION('a' IN s.nome) FROM servicos s",
+        ]
+        for query in consultas:
+            with self.subTest(query=query):
+                self.assertIsNone(validar_query(query))
+
+        # As reescritas mantêm a verificação dos identificadores
+        erro = validar_query("SELECT POSITION('a' IN s.nomes) FROM servicos s")
+        self.assertEqual((erro['tipo'], erro['identificador']), ("coluna_desconhecida", "s.nomes"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
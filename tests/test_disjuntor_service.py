@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from mysql.connector import InterfaceError
+from app import create_app
+from app.services.db_service import BancoIndisponivel, executar_query
+from app.services.disjuntor_service import Disjuntor, obter_disjuntor
+from app.services.openai_service import ErroTraducao, gerar_query
+from app.services.roteamento_service import MENSAGEM_INDISPONIVEL, responder_pergunta
+
+QUERY = "SELECT s.nome FROM servicos s;"
+LINHAS = [{'nome': 'Ana'}, {'nome': 'Bruno'}]
+
+class TestDisjuntorService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.config['LLM_NIVEIS'] = [
+            {"nome": "rapido", "modelo": "mini", "prompt": "compacto", "temperatura": 0},
+        ]
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.app.config['EXEMPLOS_PATH'] = os.path.join(self.diretorio.name, 'exemplos.json')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+        self.diretorio.cleanup()
+
+    @patch('app.services.disjuntor_service.time.monotonic')
+    def test_estados(self, mock_relogio):
+        mock_relogio.return_value = 100
+        disjuntor = Disjuntor("teste", 2, 30)
+        disjuntor.falha()
+        self.assertTrue(disjuntor.permitir())
+        disjuntor.falha()
+        self.assertTrue(disjuntor.aberto)
+        self.assertFalse(disjuntor.permitir())
+
+        # Passada a espera, só uma chamada de teste segue; a falha dela reabre o circuito
+        mock_relogio.return_value = 131
+        self.assertTrue(disjuntor.permitir())
+        self.assertFalse(disjuntor.permitir())
+        disjuntor.falha()
+        self.assertEqual(disjuntor.resumo()["estado"], "aberto")
+
+        mock_relogio.return_value = 162
+        self.assertTrue(disjuntor.permitir())
+        disjuntor.sucesso()
+        self.assertEqual(
+            disjuntor.resumo(),
+            {"estado": "fechado", "falhas_seguidas": 0, "aberturas": 2, "recusadas": 2, "reabre_em_s": None},
+        )
+
+    @patch('app.services.openai_service._chamar_llm')
+    def test_openai_abre_e_falha_na_hora(self, mock_chamar):
+        mock_chamar.side_effect = TimeoutError("429 Too Many Requests")
+        for _ in range(self.app.config['DISJUNTOR_FALHAS']):
+            with self.assertRaises(ErroTraducao):
+                gerar_query("clientes(id,nome)", "Nomes", modelo="mini", prompt="compacto")
+
+        with self.assertRaises(ErroTraducao) as contexto:
+            gerar_query("clientes(id,nome)", "Nomes", modelo="mini", prompt="compacto")
+        self.assertEqual(contexto.exception.motivo, "indisponivel")
+        self.assertEqual(mock_chamar.call_count, self.app.config['DISJUNTOR_FALHAS'])
+
+    @patch('mysql.connector.connect')
+    def test_mysql_indisponivel(self, mock_connect):
+        mock_connect.side_effect = InterfaceError(msg="Can't connect to MySQL server", errno=2003)
+        for _ in range(self.app.config['DISJUNTOR_FALHAS']):
+            with self.assertRaises(BancoIndisponivel):
+                executar_query("SELECT * FROM clientes;")
+
+        with self.assertRaises(BancoIndisponivel):
+            executar_query("SELECT * FROM clientes;")
+        self.assertEqual(mock_connect.call_count, self.app.config['DISJUNTOR_FALHAS'])
+        self.assertTrue(obter_disjuntor("mysql").aberto)
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_serve_resposta_guardada_quando_o_banco_cai(self, mock_gerar, mock_executar):
+        mock_gerar.return_value = QUERY
+        mock_executar.return_value = LINHAS
+        responder_pergunta("schema", "Nomes dos clientes?", "sessao-1")
+
+        mock_executar.side_effect = BancoIndisponivel("O banco de dados não respondeu")
+        # Outro usuário faz a mesma pergunta, escrita de outro jeito
+        resposta = responder_pergunta("schema", "nomes dos  clientes", "sessao-2")
+
+        self.assertEqual(resposta["nivel"], "cache")
+        self.assertTrue(resposta["desatualizada"])
+        self.assertEqual(resposta["idade"], 0)
+        self.assertEqual((resposta["query"], resposta["resultados"]), (QUERY, LINHAS))
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_disjuntor_aberto_nao_chama_o_llm(self, mock_gerar, mock_executar):
+        for _ in range(self.app.config['DISJUNTOR_FALHAS']):
+            obter_disjuntor("mysql").falha()
+        cliente = self.app.test_client()
+
+        resposta = cliente.post('/pergunta', json={"pergunta": "Nomes dos clientes"})
+
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.get_json()["erro"], MENSAGEM_INDISPONIVEL)
+        mock_gerar.assert_not_called()
+        self.assertEqual(cliente.get('/metricas').get_json()["disjuntores"]["mysql"]["estado"], "aberto")
+
+if __name__ == '__main__':
+    unittest.main()
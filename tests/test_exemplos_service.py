@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from app import create_app
+from app.services.exemplos_service import (
+    RepositorioExemplos,
+    carregar_exemplos,
+    descarregar_exemplos,
+    init_exemplos,
+    registrar_resposta,
+    salvar_exemplos,
+    tokenizar,
+)
+from app.services.openai_service import montar_mensagens
+
+class TestExemplosService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+
+    def test_tokenizar(self):
+        self.assertEqual(tokenizar("Quais vendedores de Veículos"), ["vende", "veicu"])
+        self.assertEqual(tokenizar("vendedor"), tokenizar("vendedores"))
+
+    def test_semente_carregada_e_busca_relevante(self):
+        repositorio = self.app.extensions['exemplos']
+        self.assertGreater(len(repositorio), 0)
+
+        exemplos = repositorio.buscar("Quais vendas estão com pagamento pendente?", 2)
+        self.assertIn("caixas_pendentes", exemplos[0]['query'])
+
+        exemplos = repositorio.buscar("Notas fiscais emitidas por empresa em outubro", 1)
+        self.assertIn("notas_fiscais", exemplos[0]['query'])
+
+    def test_busca_sem_termos_em_comum(self):
+        repositorio = RepositorioExemplos(10, 3600)
+        repositorio.adicionar("Liste os clientes", "SELECT nome FROM clientes;")
+        self.assertEqual(repositorio.buscar("estoque de peças", 3), [])
+
+    def test_pergunta_repetida_atualiza_a_query(self):
+        repositorio = RepositorioExemplos(10, 3600)
+        primeiro = repositorio.adicionar("Liste os clientes", "SELECT * FROM clientes;")
+        segundo = repositorio.adicionar("liste os Clientes?", "SELECT nome FROM clientes;")
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(len(repositorio), 1)
+        self.assertEqual(repositorio.buscar("clientes", 1)[0]['query'], "SELECT nome FROM clientes;")
+
+    def test_despejo_respeita_tamanho_maximo(self):
+        repositorio = RepositorioExemplos(2, 3600)
+        ruim = repositorio.adicionar("clientes ativos", "SELECT 1;")
+        bom = repositorio.adicionar("clientes inativos", "SELECT 2;")
+        repositorio.registrar_resultado([ruim], False)
+        repositorio.registrar_resultado([bom], True)
+
+        repositorio.adicionar("clientes novos", "SELECT 3;", sucessos=1)
+
+        self.assertEqual(len(repositorio), 2)
+        queries = {e['query'] for e in repositorio.buscar("clientes", 5)}
+        self.assertEqual(queries, {"SELECT 2;", "SELECT 3;"})
+
+    def test_despejo_prioriza_exemplos_expirados(self):
+        repositorio = RepositorioExemplos(2, 60)
+        repositorio.adicionar("clientes antigos", "SELECT 1;", sucessos=5, ultimo_uso=time.time() - 120)
+        repositorio.adicionar("clientes ativos", "SELECT 2;")
+        repositorio.adicionar("clientes novos", "SELECT 3;")
+
+        queries = {e['query'] for e in repositorio.buscar("clientes", 5)}
+        self.assertEqual(queries, {"SELECT 2;", "SELECT 3;"})
+
+    def test_salvar_e_carregar(self):
+        repositorio = RepositorioExemplos(10, 3600)
+        id_exemplo = repositorio.adicionar("Liste os clientes", "SELECT nome FROM clientes;")
+        repositorio.registrar_resultado([id_exemplo], True)
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'sub', 'exemplos.json')
+            salvar_exemplos(repositorio, caminho)
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.assertEqual(json.load(arquivo)[0]['sucessos'], 1)
+
+            carregado = RepositorioExemplos(10, 3600)
+            carregar_exemplos(carregado, caminho)
+
+        exemplo = carregado.buscar("clientes", 1)[0]
+        self.assertEqual(exemplo['query'], "SELECT nome FROM clientes;")
+        self.assertEqual(exemplo['sucessos'], 1)
+
+    def test_salvar_concorrente_nao_corrompe(self):
+        repositorio = RepositorioExemplos(100, 3600)
+        for i in range(50):
+            repositorio.adicionar(f"pergunta {i}", f"SELECT {i};")
+        erros = []
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'exemplos.json')
+
+            def salvar():
+                try:
+                    for _ in range(10):
+                        salvar_exemplos(repositorio, caminho)
+                except Exception as e:
+                    erros.append(e)
+
+            threads = [threading.Thread(target=salvar) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(erros, [])
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.assertEqual(len(json.load(arquivo)), 50)
+            self.assertEqual(os.listdir(diretorio), ['exemplos.json'])
+
+    def test_arquivo_corrompido_usa_semente(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'exemplos.json')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write('[{"pergunta": "truncado"')
+            self.app.config['EXEMPLOS_PATH'] = caminho
+            with self.assertLogs(self.app.logger, level='ERROR'):
+                init_exemplos(self.app)
+
+        self.assertGreater(len(self.app.extensions['exemplos']), 0)
+
+    def test_registrar_resposta_grava_fora_da_requisicao(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'exemplos.json')
+            self.app.config['EXEMPLOS_PATH'] = caminho
+            self.app.config['EXEMPLOS_SALVAR_INTERVALO'] = 3600
+
+            registrar_resposta("Liste os clientes", "SELECT nome FROM clientes;", [], True)
+            self.assertFalse(os.path.exists(caminho))
+
+            descarregar_exemplos(self.app)
+            with open(caminho, encoding='utf-8') as arquivo:
+                queries = {e['query'] for e in json.load(arquivo)}
+            self.assertIn("SELECT nome FROM clientes;", queries)
+
+            # Sem novas alterações, não há o que gravar
+            os.remove(caminho)
+            descarregar_exemplos(self.app)
+            self.assertFalse(os.path.exists(caminho))
+
+    def test_exemplos_no_prompt(self):
+        exemplos = [{"pergunta": "Liste os clientes", "query": "SELECT nome FROM clientes;"}]
+        mensagens = montar_mensagens("schema", "Quantos clientes?", prompt="compacto", exemplos=exemplos)
+        self.assertIn("Liste os clientes", mensagens[0]['content'])
+        self.assertIn("SELECT nome FROM clientes;", mensagens[0]['content'])
+
+if __name__ == '__main__':
+    unittest.main()
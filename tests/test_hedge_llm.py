@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app import create_app
+from app.services.metricas_service import limpar_metricas, obter_metricas
+from app.services.openai_service import ErroTraducao, gerar_query
+
+
+class ServidorOpenAIFalso:
+    """
+    Servidor HTTP local que imita /v1/chat/completions com latência injetada.
+
+    `latencias` é consumida em ordem, uma por requisição recebida.
+    """
+    def __init__(self, latencias, conteudo="```sql\nSELECT 1;\n```"):
+        self.latencias = list(latencias)
+        self.requisicoes = 0
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with threading.Lock():
+                    indice = servidor.requisicoes
+                    servidor.requisicoes += 1
+                time.sleep(servidor.latencias[min(indice, len(servidor.latencias) - 1)])
+                corpo = json.dumps({
+                    "id": f"chatcmpl-{indice}", "object": "chat.completion", "created": 0, "model": "falso",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": f"{conteudo} -- {indice}"}}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+                }).encode('utf-8')
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente cancelou a requisição perdedora
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestHedgeLLM(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.config['OPENAI_API_KEY'] = 'chave-de-teste'
+        self.app.config['LLM_PRAZO'] = 3
+        self.app.config['LLM_HEDGE_ATRASO'] = '0.2'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        limpar_metricas()
+
+    def tearDown(self):
+        self.servidor.parar()
+        # Remover o contexto após o teste
+        self.app_context.pop()
+
+    def _gerar(self, latencias):
+        self.servidor = ServidorOpenAIFalso(latencias, conteudo="```sql\nSELECT 1\n```")
+        self.app.config['OPENAI_BASE_URL'] = self.servidor.url
+        return gerar_query("t(id)", "?", modelo="falso", prompt="compacto")
+
+    def test_sem_hedge_quando_a_resposta_e_rapida(self):
+        self.assertEqual(self._gerar([0.01]), "SELECT 1")
+        self.assertEqual(self.servidor.requisicoes, 1)
+        metricas = obter_metricas()["hedge"]["falso"]
+        self.assertEqual(metricas["hedges"], 0)
+        self.assertEqual(metricas["taxa_hedge"], 0)
+
+    def test_hedge_vence_a_requisicao_lenta(self):
+        inicio = time.perf_counter()
+        self.assertEqual(self._gerar([2.0, 0.01]), "SELECT 1")
+        self.assertLess(time.perf_counter() - inicio, 1.5)
+        self.assertEqual(self.servidor.requisicoes, 2)
+        metricas = obter_metricas()["hedge"]["falso"]
+        self.assertEqual(metricas["hedges"], 1)
+        self.assertEqual(metricas["vitorias_hedge"], 1)
+        self.assertEqual(metricas["taxa_vitoria_hedge"], 1.0)
+        self.assertEqual(metricas["tokens_extras"], 110)
+
+    def test_prazo_excedido(self):
+        self.app.config['LLM_PRAZO'] = 0.5
+        inicio = time.perf_counter()
+        with self.assertRaises(ErroTraducao) as contexto:
+            self._gerar([2.0, 2.0])
+        self.assertEqual(contexto.exception.motivo, "prazo")
+        self.assertLess(time.perf_counter() - inicio, 1.5)
+        self.assertEqual(obter_metricas()["hedge"]["falso"]["falhas"], {"prazo": 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import unittest
+from app import create_app, preaquecer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestInicializacao(unittest.TestCase):
+    def test_create_app_nao_importa_clientes_pesados(self):
+        # Em um interpretador novo, para não depender do que outros testes já importaram
+        codigo = (
+            "import sys\n"
+            "from app import create_app\n"
+            "create_app()\n"
+            "print('carregados:' + ','.join(m for m in ('openai', 'mysql.connector') if m in sys.modules))\n"
+        )
+        saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+        self.assertEqual(saida.stdout.strip().splitlines()[-1], "carregados:")
+
+    def test_handler_de_log_nao_se_repete(self):
+        create_app()
+        app = create_app()
+        arquivos = [h.baseFilename for h in app.logger.handlers if hasattr(h, 'baseFilename')]
+        self.assertEqual(len(arquivos), len(set(arquivos)))
+
+    def test_preaquecer_codifica_o_schema(self):
+        app = create_app()
+        preaquecer(app)
+        self.assertIn('openai', sys.modules)
+
+        from app.services.schema_service import _cache_codificacao
+        schemas = [schema for schema, _ in _cache_codificacao.values()]
+        self.assertTrue(any(schema is app.extensions['schema'] for schema in schemas))
+
+if __name__ == '__main__':
+    unittest.main()
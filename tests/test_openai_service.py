@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import patch
 from app import create_app
-from app.services.openai_service import traduzir_para_query
+from app.services.openai_service import ErroTraducao, gerar_query, gerar_query_local, traduzir_para_query
 
 class TestOpenAIService(unittest.TestCase):
     def setUp(self):
@@ -14,13 +14,9 @@ class TestOpenAIService(unittest.TestCase):
         # Remover o contexto após o teste
         self.app_context.pop()
 
-    @patch('openai.ChatCompletion.create')
+    @patch('app.services.openai_service._chamar_llm')
     def test_traduzir_para_query(self, mock_create):
-        mock_create.return_value = {
-            'choices': [
-                {'message': {'content': 'SELECT * FROM clientes;'}}
-            ]
-        }
+        mock_create.return_value = 'SELECT * FROM clientes;'
         schema = """
         Tabela: clientes
         - id (INT, Primary Key)
@@ -32,14 +28,10 @@ class TestOpenAIService(unittest.TestCase):
         query = traduzir_para_query(schema, pergunta)
         self.assertEqual(query, 'SELECT * FROM clientes;')
 
-    @patch('openai.ChatCompletion.create')
+    @patch('app.services.openai_service._chamar_llm')
     def test_traduzir_para_query_invalid_command(self, mock_create):
         # Simular uma query não-SELECT
-        mock_create.return_value = {
-            'choices': [
-                {'message': {'content': 'DELETE FROM clientes WHERE id=1;'}}
-            ]
-        }
+        mock_create.return_value = 'DELETE FROM clientes WHERE id=1;'
         schema = """
         Tabela: clientes
         - id (INT, Primary Key)
@@ -51,5 +43,40 @@ class TestOpenAIService(unittest.TestCase):
         query = traduzir_para_query(schema, pergunta)
         self.assertIn("Erro na tradução da pergunta", query)
 
+    @patch('app.services.openai_service._chamar_llm')
+    def test_gerar_query_bloco_sql(self, mock_create):
+        mock_create.return_value = "thinking...\n```sql\nSELECT nome FROM clientes;\n```"
+        query = gerar_query("clientes(id,nome)", "Nomes dos clientes", modelo="gpt-4o-mini", prompt="compacto")
+        self.assertEqual(query, "SELECT nome FROM clientes;")
+        self.assertEqual(mock_create.call_args[0][0], "gpt-4o-mini")
+        self.assertIn("clientes(id,nome)", mock_create.call_args[0][1][0]['content'])
+
+    @patch('app.services.openai_service._chamar_llm')
+    def test_gerar_query_motivos_de_falha(self, mock_create):
+        mock_create.return_value = "Não sei responder."
+        with self.assertRaises(ErroTraducao) as contexto:
+            gerar_query("clientes(id,nome)", "?")
+        self.assertEqual(contexto.exception.motivo, "extracao")
+
+        mock_create.return_value = "```sql\nDELETE FROM clientes;\n```"
+        with self.assertRaises(ErroTraducao) as contexto:
+            gerar_query("clientes(id,nome)", "?")
+        self.assertEqual(contexto.exception.motivo, "validacao")
+
+        mock_create.side_effect = RuntimeError("timeout")
+        with self.assertRaises(ErroTraducao) as contexto:
+            gerar_query("clientes(id,nome)", "?")
+        self.assertEqual(contexto.exception.motivo, "llm")
+
+    @patch('app.services.openai_service._chamar_llm')
+    def test_gerar_query_local_marcadores(self, mock_create):
+        tabela = {"colunas": {"vendedor": "TEXT"}, "amostra": [], "total": 0}
+        for resposta, motivo in (("NAO_LOCAL", "nao_local"), ("```\nNOVA_PERGUNTA\n```", "nova_pergunta")):
+            with self.subTest(resposta=resposta):
+                mock_create.return_value = resposta
+                with self.assertRaises(ErroTraducao) as contexto:
+                    gerar_query_local(tabela, "Lucro por vendedor", "e em 2023?", "gpt-4o-mini")
+                self.assertEqual(contexto.exception.motivo, motivo)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from app import create_app
+from app.config import Config
+from app.services.paginacao_service import (
+    ErroPaginacao,
+    chaves_ordenacao,
+    primeira_pagina,
+    proxima_pagina,
+)
+from app.services.sessao_service import guardar_resultado
+
+LINHAS = [
+    {'vendedor': 'Ana', 'lucro': Decimal('900.00')},
+    {'vendedor': 'Bruno', 'lucro': Decimal('700.00')},
+    {'vendedor': 'Carla', 'lucro': Decimal('700.00')},
+    {'vendedor': 'Davi', 'lucro': Decimal('500.00')},
+    {'vendedor': 'Eva', 'lucro': None},
+]
+
+QUERY = (
+    "SELECT f.nome AS vendedor, SUM(osv.valor_venda) AS lucro FROM os JOIN os_servicos osv ON osv.os_id = os.id "
+    "JOIN funcionarios f ON f.id = os.vendedor_id WHERE os.paga = 1 GROUP BY f.nome ORDER BY lucro DESC;"
+)
+
+class TestPaginacaoService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.config['PAGINA_TAMANHO'] = 2
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.app.config['EXEMPLOS_PATH'] = os.path.join(self.diretorio.name, 'exemplos.json')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+        self.diretorio.cleanup()
+
+    def test_chaves_ordenacao(self):
+        colunas = ['vendedor_nome', 'nome', 'quantidade']
+        query = (
+            "SELECT f.nome AS vendedor_nome, s.nome, COUNT(*) AS quantidade FROM os "
+            "WHERE os.id IN (SELECT os_id FROM caixas ORDER BY id) "
+            "GROUP BY 1, 2 ORDER BY vendedor_nome, s.nome DESC, 3 LIMIT 50"
+        )
+        self.assertEqual(
+            chaves_ordenacao(query, colunas),
+            [('vendedor_nome', False), ('nome', True), ('quantidade', False)],
+        )
+        # Ordenação por coluna que não está no resultado ou por expressão
+        self.assertIsNone(chaves_ordenacao("SELECT c.nome FROM clientes c JOIN f ORDER BY f.nome", ['nome']))
+        self.assertIsNone(chaves_ordenacao("SELECT nome FROM clientes ORDER BY COUNT(*) DESC", ['nome']))
+        self.assertIsNone(chaves_ordenacao("SELECT nome FROM clientes", ['nome']))
+
+    def test_paginas_do_resultado_guardado(self):
+        guardar_resultado("sessao", "Lucro por vendedor", QUERY, LINHAS)
+        pagina = primeira_pagina({"query": QUERY, "resultados": LINHAS, "nivel": "rapido"}, "sessao")
+
+        self.assertEqual(pagina["colunas"], ['vendedor', 'lucro'])
+        self.assertEqual(pagina["linhas"], [['Ana', Decimal('900.00')], ['Bruno', Decimal('700.00')]])
+        self.assertEqual(pagina["total"], 5)
+
+        with patch('app.services.paginacao_service.executar_query') as mock_executar:
+            pagina = proxima_pagina(pagina["cursor"], "sessao")
+            self.assertEqual(pagina["linhas"], [['Carla', Decimal('700.00')], ['Davi', Decimal('500.00')]])
+            pagina = proxima_pagina(pagina["cursor"], "sessao")
+            self.assertEqual(pagina["linhas"], [['Eva', None]])
+            self.assertIsNone(pagina["cursor"])
+            mock_executar.assert_not_called()
+
+    @patch('app.services.paginacao_service.executar_query')
+    def test_keyset_no_mysql_pula_empatados(self, mock_executar):
+        pagina = primeira_pagina({"query": QUERY, "resultados": LINHAS, "nivel": "rapido"})
+        # A consulta volta a partir da fronteira (Bruno, 700) e pula o Bruno, já entregue
+        mock_executar.return_value = LINHAS[1:4]
+
+        pagina = proxima_pagina(pagina["cursor"])
+
+        query, params = mock_executar.call_args.args
+        self.assertEqual(
+            query,
+            "SELECT * FROM (SELECT f.nome AS vendedor, SUM(osv.valor_venda) AS lucro FROM os JOIN os_servicos osv "
+            "ON osv.os_id = os.id JOIN funcionarios f ON f.id = os.vendedor_id WHERE os.paga = %s "
+            "GROUP BY f.nome ORDER BY lucro DESC) AS _pagina "
+            "WHERE ((_pagina.`lucro` < %s OR _pagina.`lucro` IS NULL)) OR (_pagina.`lucro` = %s) "
+            "ORDER BY _pagina.`lucro` DESC LIMIT %s",
+        )
+        self.assertEqual(params, (1, Decimal('700.00'), Decimal('700.00'), 3))
+        self.assertEqual(pagina["linhas"], [['Carla', Decimal('700.00')], ['Davi', Decimal('500.00')]])
+
+        # Na coluna decrescente, o NULL da Eva vem depois da fronteira
+        mock_executar.return_value = LINHAS[3:]
+        pagina = proxima_pagina(pagina["cursor"])
+        self.assertEqual(pagina["linhas"], [['Eva', None]])
+        self.assertEqual(mock_executar.call_args.args[1], (1, Decimal('500.00'), Decimal('500.00'), 3))
+        self.assertIsNone(pagina["cursor"])
+
+    @patch('app.services.paginacao_service.executar_query')
+    def test_offset_sem_order_by(self, mock_executar):
+        query = "SELECT nome AS vendedor, lucro FROM vendas WHERE ano = 2024"
+        pagina = primeira_pagina({"query": query, "resultados": LINHAS, "nivel": "rapido"})
+        mock_executar.return_value = LINHAS[2:4]
+
+        proxima_pagina(pagina["cursor"])
+
+        self.assertEqual(
+            mock_executar.call_args.args,
+            ("SELECT * FROM (SELECT nome AS vendedor, lucro FROM vendas WHERE ano = %s) AS _pagina LIMIT %s OFFSET %s",
+             (2024, 2, 2)),
+        )
+
+    def test_cursor_invalido_e_resultado_local_expirado(self):
+        with self.assertRaises(ErroPaginacao):
+            proxima_pagina("nao-e-um-cursor")
+
+        guardar_resultado("sessao", "Lucro", "SELECT * FROM resultado", LINHAS)
+        pagina = primeira_pagina({"query": "SELECT * FROM resultado", "resultados": LINHAS, "nivel": "local"}, "sessao")
+        guardar_resultado("sessao", "Outra pergunta", "SELECT 1", LINHAS[:1])
+        with self.assertRaises(ErroPaginacao):
+            proxima_pagina(pagina["cursor"], "sessao")
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_rotas(self, mock_gerar, mock_executar):
+        mock_gerar.return_value = QUERY
+        mock_executar.return_value = LINHAS
+        cliente = self.app.test_client()
+
+        resposta = cliente.post('/pergunta', json={"pergunta": "Lucro por vendedor"}).get_json()
+        self.assertEqual(resposta["total"], 5)
+        self.assertEqual(len(resposta["linhas"]), 2)
+
+        pagina = cliente.post('/pergunta/pagina', json={"cursor": resposta["cursor"]}).get_json()
+        self.assertEqual(pagina["linhas"][0][0], 'Carla')
+
+        # A rota de páginas tem limite próprio, acima do padrão de 50 por hora
+        for _ in range(60):
+            self.assertEqual(cliente.post('/pergunta/pagina', json={"cursor": "x"}).status_code, 410)
+
+    def test_limite_da_paginacao(self):
+        with patch.object(Config, 'PAGINACAO_LIMITE', '3 per hour'):
+            app = create_app()
+        cliente = app.test_client()
+
+        respostas = [cliente.post('/pergunta/pagina', json={"cursor": "x"}).status_code for _ in range(4)]
+        self.assertEqual(respostas, [410, 410, 410, 429])
+
+if __name__ == '__main__':
+    unittest.main()
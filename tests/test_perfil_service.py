@@ -0,0 +1,94 @@
+import os
+import re
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from app import create_app
+from app.services.perfil_service import AmostradorPilhas, formatar_colapsado, instalar_sinal_perfil
+
+def _ocupado(parar):
+    while not parar.is_set():
+        sum(range(1000))
+
+class TestPerfilService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.app.config['PERFIL_TOKEN'] = 'segredo'
+        self.app.config['PERFIL_DIRETORIO'] = self.diretorio.name
+        self.app.config['PERFIL_INTERVALO'] = 0.001
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.parar = threading.Event()
+        self.ocupada = threading.Thread(target=_ocupado, args=(self.parar,))
+        self.ocupada.start()
+
+    def tearDown(self):
+        self.parar.set()
+        self.ocupada.join()
+        # Remover o contexto após o teste
+        self.app_context.pop()
+        self.diretorio.cleanup()
+
+    def test_amostrador_filtra_threads(self):
+        amostrador = AmostradorPilhas(0.001, threads={self.ocupada.ident}).iniciar()
+        time.sleep(0.1)
+        contagens = amostrador.parar()
+
+        self.assertGreater(amostrador.amostras, 0)
+        self.assertTrue(contagens)
+        # A amostra pode pegar a thread dentro de uma função chamada por _ocupado (Event.is_set)
+        self.assertTrue(all("test_perfil_service:_ocupado" in pilha for pilha in contagens))
+        self.assertTrue(all(pilha.startswith("threading:") for pilha in contagens))
+        for linha in formatar_colapsado(contagens).splitlines():
+            self.assertRegex(linha, r"^\S.* \d+$")
+
+    def test_endpoint_exige_token(self):
+        cliente = self.app.test_client()
+        self.assertEqual(cliente.get('/admin/perfil').status_code, 403)
+        self.assertEqual(cliente.get('/admin/perfil', headers={"X-Admin-Token": "outro"}).status_code, 403)
+
+        self.app.config['PERFIL_TOKEN'] = ''
+        self.assertEqual(cliente.get('/admin/perfil', headers={"X-Admin-Token": ""}).status_code, 404)
+
+    def test_endpoint_perfila_o_processo(self):
+        resposta = self.app.test_client().get('/admin/perfil?segundos=0.1', headers={"X-Admin-Token": "segredo"})
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.mimetype, 'text/plain')
+        self.assertIn("test_perfil_service:_ocupado ", resposta.get_data(as_text=True))
+
+    def test_perfil_por_requisicao(self):
+        cliente = self.app.test_client()
+        self.assertNotIn('X-Perfil-Arquivo', cliente.get('/metricas').headers)
+
+        resposta = cliente.get('/metricas', headers={"X-Perfil-Token": "segredo"})
+
+        arquivo = resposta.headers['X-Perfil-Arquivo']
+        self.assertRegex(arquivo, rf"^perfil-requisicao-{os.getpid()}-\d+\.folded$")
+        with open(os.path.join(self.diretorio.name, arquivo), encoding='utf-8') as perfil:
+            # Só a thread da requisição é amostrada
+            self.assertNotIn("_ocupado", perfil.read())
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR2'), "sinal indisponível nesta plataforma")
+    def test_sinal_salva_o_perfil(self):
+        self.app.config['PERFIL_SINAL_SEGUNDOS'] = 0.1
+        anterior = signal.getsignal(signal.SIGUSR2)
+        instalar_sinal_perfil(self.app)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR2)
+            limite = time.time() + 5
+            while not os.listdir(self.diretorio.name) and time.time() < limite:
+                time.sleep(0.05)
+        finally:
+            signal.signal(signal.SIGUSR2, anterior)
+
+        arquivos = os.listdir(self.diretorio.name)
+        self.assertEqual(len(arquivos), 1)
+        self.assertTrue(re.match(rf"perfil-sinal-{os.getpid()}-\d+\.folded", arquivos[0]))
+
+if __name__ == '__main__':
+    unittest.main()
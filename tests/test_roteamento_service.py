@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.services.exemplos_service import descarregar_exemplos
+from app.services.metricas_service import limpar_metricas, obter_metricas
+from app.services.openai_service import ErroTraducao
+from app.services.roteamento_service import MENSAGEM_INDISPONIVEL, responder_pergunta
+
+class TestRoteamentoService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.config['LLM_NIVEIS'] = [
+            {"nome": "rapido", "modelo": "mini", "prompt": "compacto", "temperatura": 0},
+            {"nome": "grande", "modelo": "grande", "prompt": "completo", "temperatura": 1},
+        ]
+        self.app.config['LLM_ESCALAR_EM'] = ["extracao", "validacao", "banco"]
+        # Os exemplos aprendidos são salvos fora do repositório
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.app.config['EXEMPLOS_PATH'] = os.path.join(self.diretorio.name, 'exemplos.json')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        limpar_metricas()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+        self.diretorio.cleanup()
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_responde_no_nivel_rapido(self, mock_gerar, mock_executar):
+        mock_gerar.return_value = "SELECT * FROM clientes;"
+        mock_executar.return_value = [{'id': 1}]
+
+        resposta = responder_pergunta("schema", "Liste os clientes.")
+
+        self.assertEqual(resposta, {"query": "SELECT * FROM clientes;", "resultados": [{'id': 1}], "nivel": "rapido"})
+        self.assertEqual(mock_gerar.call_count, 1)
+        self.assertEqual(mock_gerar.call_args.kwargs['modelo'], "mini")
+        self.assertEqual(obter_metricas()["nivel"]["rapido"]["sucessos"], 1)
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_escala_apos_erro_do_banco(self, mock_gerar, mock_executar):
+        mock_gerar.side_effect = ["SELECT x FROM clientes;", "SELECT nome FROM clientes;"]
+        mock_executar.side_effect = ["Erro ao executar a query: Unknown column 'x'", [{'nome': 'João'}]]
+
+        resposta = responder_pergunta("schema", "Nomes dos clientes")
+
+        self.assertEqual(resposta["nivel"], "grande")
+        self.assertEqual(resposta["resultados"], [{'nome': 'João'}])
+        self.assertIn("Unknown column 'x'", mock_gerar.call_args.kwargs['erro_anterior'])
+        metricas = obter_metricas()["nivel"]
+        self.assertEqual(metricas["rapido"]["falhas"], {"banco": 1})
+        self.assertEqual(metricas["grande"]["taxa_sucesso"], 1.0)
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_escala_apos_validacao_local_sem_acessar_o_banco(self, mock_gerar, mock_executar):
+        mock_gerar.side_effect = ["SELECT os.valor FROM os;", "SELECT os.id FROM os;"]
+        mock_executar.return_value = [{'id': 1}]
+
+        resposta = responder_pergunta("schema", "Valor das OS")
+
+        self.assertEqual(resposta["nivel"], "grande")
+        mock_executar.assert_called_once_with("SELECT os.id FROM os;")
+        self.assertIn('"coluna_desconhecida"', mock_gerar.call_args.kwargs['erro_anterior'])
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_nao_escala_em_falha_fora_das_regras(self, mock_gerar, mock_executar):
+        mock_gerar.side_effect = ErroTraducao("sem resposta", "llm")
+
+        resposta = responder_pergunta("schema", "Nomes dos clientes")
+
+        self.assertEqual(resposta["nivel"], "rapido")
+        # A mensagem da exceção fica no log; o usuário recebe a de indisponibilidade
+        self.assertEqual(resposta["resultados"], MENSAGEM_INDISPONIVEL)
+        self.assertEqual(mock_gerar.call_count, 1)
+        mock_executar.assert_not_called()
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_usa_exemplos_e_aprende_a_resposta(self, mock_gerar, mock_executar):
+        mock_gerar.return_value = "SELECT s.nome FROM servicos s;"
+        mock_executar.return_value = [{'nome': 'Polimento'}]
+
+        responder_pergunta("schema", "Quais serviços foram mais lucrativos em 2023?")
+
+        exemplos = mock_gerar.call_args.kwargs['exemplos']
+        self.assertIn("lucrativos", exemplos[0]['pergunta'])
+        # A gravação fica para depois da requisição
+        self.assertFalse(os.path.exists(self.app.config['EXEMPLOS_PATH']))
+        descarregar_exemplos(self.app)
+        self.assertTrue(os.path.exists(self.app.config['EXEMPLOS_PATH']))
+        aprendidos = self.app.extensions['exemplos'].buscar("serviços lucrativos em 2023", 1)
+        self.assertEqual(aprendidos[0]['query'], "SELECT s.nome FROM servicos s;")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from app import create_app
+from app.schema_estatico import SCHEMA
+from app.services.schema_service import (
+    atualizar_schema,
+    auditoria_relevante,
+    carregar_snapshot,
+    codificar_schema,
+    salvar_snapshot,
+    schema_de_texto,
+    schema_para_texto,
+)
+
+class TestSchemaService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+
+    def test_schema_de_texto(self):
+        schema = schema_de_texto(SCHEMA)
+        os_tabela = schema['tabelas']['os']
+        self.assertEqual(os_tabela['colunas'][0], ['id', ''])
+        self.assertEqual(os_tabela['fks']['cliente_id'], 'clientes.id')
+        # Colunas com aspas quebradas foram corrigidas
+        colunas = [c for c, _ in schema['tabelas']['tonalidades']['colunas']]
+        self.assertEqual(colunas, ['id', 'nome', 'ativo', 'created_at', 'updated_at', 'deleted_at'])
+
+    def test_schema_para_texto_ida_e_volta(self):
+        schema = schema_de_texto(SCHEMA)
+        self.assertEqual(schema_de_texto(schema_para_texto(schema))['tabelas'], schema['tabelas'])
+
+    def test_schema_para_compacto(self):
+        schema = schema_de_texto(SCHEMA)
+        compacto = codificar_schema(schema, "compacto")
+        linhas = compacto.splitlines()
+        # A os tem created_at e deleted_at, mas não updated_at
+        linha_os = next(linha for linha in linhas if linha.startswith("os*cd("))
+        self.assertIn("fk:cliente_carro_id->cliente_carros,cliente_id->clientes", linha_os)
+        self.assertIn("-- ordens de serviço", linha_os)
+        self.assertNotIn("created_at", linha_os)
+        self.assertTrue(any(linha.split("(", 1)[0].endswith("*cud") for linha in linhas))
+        # Tabelas de mesma estrutura compartilham a linha
+        self.assertIn("caixa_status,caixa_tipos", compacto)
+        self.assertLess(len(compacto), len(SCHEMA) * 0.6)
+
+    def test_codificar_schema_com_auditoria_e_cache(self):
+        schema = schema_de_texto(SCHEMA)
+        self.assertTrue(auditoria_relevante("Quantos clientes foram cadastrados ontem?"))
+        self.assertFalse(auditoria_relevante("Faturamento por vendedor"))
+        com_auditoria = codificar_schema(schema, "compacto", incluir_auditoria=True)
+        self.assertIn("created_at", com_auditoria)
+        self.assertIs(codificar_schema(schema, "compacto", incluir_auditoria=True), com_auditoria)
+        with self.assertRaises(ValueError):
+            codificar_schema(schema, "xml")
+
+    def test_snapshot_ida_e_volta(self):
+        schema = schema_de_texto(SCHEMA)
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'snapshot', 'schema.json')
+            self.assertIsNone(carregar_snapshot(caminho))
+            salvar_snapshot(schema, caminho)
+            self.assertEqual(carregar_snapshot(caminho), schema)
+
+    @patch('app.services.schema_service.introspectar')
+    @patch('app.services.schema_service.calcular_checksums')
+    @patch('app.services.schema_service.conectar')
+    def test_atualizar_schema_incremental(self, mock_conectar, mock_checksums, mock_introspectar):
+        schema = {
+            "formato": 1, "versao": 3, "gerado_em": None,
+            "tabelas": {
+                "clientes": {"descricao": "Clientes", "colunas": [["id", "int"]], "fks": {}, "indices": {}, "checksum": "a"},
+                "pedidos": {"descricao": "", "colunas": [["id", "int"]], "fks": {}, "indices": {}, "checksum": "b"},
+            },
+        }
+        mock_checksums.return_value = {"clientes": "a2", "pedidos": "b"}
+        mock_introspectar.return_value = {
+            "clientes": {"descricao": "", "colunas": [["id", "int"], ["nome", "varchar"]], "fks": {}, "indices": {}, "checksum": ""},
+        }
+
+        novo, alterado = atualizar_schema(schema)
+
+        self.assertTrue(alterado)
+        mock_introspectar.assert_called_once()
+        self.assertEqual(mock_introspectar.call_args[0][2], ["clientes"])
+        self.assertEqual(novo['versao'], 4)
+        self.assertEqual(novo['tabelas']['clientes']['checksum'], "a2")
+        self.assertEqual(novo['tabelas']['clientes']['descricao'], "Clientes")
+        self.assertIs(novo['tabelas']['pedidos'], schema['tabelas']['pedidos'])
+
+    @patch('app.services.schema_service.introspectar')
+    @patch('app.services.schema_service.calcular_checksums')
+    @patch('app.services.schema_service.conectar')
+    def test_atualizar_schema_so_rele_tabelas_do_schema(self, mock_conectar, mock_checksums, mock_introspectar):
+        schema = schema_de_texto(SCHEMA)
+        checksums = {nome: "" for nome in schema['tabelas']}
+        mock_checksums.return_value = {**checksums, "os": "novo", "logs_acesso": "x"}
+        # O banco não declara FKs: os relacionamentos manuais continuam no schema
+        mock_introspectar.return_value = {
+            "os": {"descricao": "", "colunas": [["id", "int"], ["cliente_id", "int"]], "fks": {}, "indices": {}, "checksum": ""},
+        }
+
+        novo, _ = atualizar_schema(schema)
+
+        self.assertEqual(mock_introspectar.call_args[0][2], ["os"])
+        self.assertNotIn("logs_acesso", novo['tabelas'])
+        self.assertEqual(novo['tabelas']['os']['fks'], {"cliente_id": "clientes.id"})
+
+        self.app.config['SCHEMA_TABELAS'] = ["os", "logs_acesso"]
+        mock_introspectar.return_value = {}
+        novo, _ = atualizar_schema(schema)
+        self.assertEqual(sorted(mock_introspectar.call_args[0][2]), ["logs_acesso", "os"])
+        self.assertEqual(sorted(novo['tabelas']), ["os"])
+
+    @patch('app.services.schema_service.calcular_checksums')
+    @patch('app.services.schema_service.conectar')
+    def test_atualizar_schema_sem_alteracao(self, mock_conectar, mock_checksums):
+        schema = schema_de_texto(SCHEMA)
+        mock_checksums.return_value = {nome: "" for nome in schema['tabelas']}
+        novo, alterado = atualizar_schema(schema)
+        self.assertFalse(alterado)
+        self.assertIs(novo, schema)
+
+if __name__ == '__main__':
+    unittest.main()
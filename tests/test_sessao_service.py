@@ -0,0 +1,196 @@
+import os
+import tempfile
+import time
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from app import create_app
+from app.services.openai_service import ErroTraducao
+from app.services.roteamento_service import responder_pergunta
+from app.services.sessao_service import (
+    ArmazemResultados,
+    carregar_local,
+    eh_refinamento,
+    estimar_bytes,
+    refinar_por_regras,
+    responder_localmente,
+)
+
+LINHAS = [
+    {'departamento': 'Oficina', 'vendedor': 'Ana', 'lucro': Decimal('1500.00'), 'quantidade': 12},
+    {'departamento': 'Veículos usados', 'vendedor': 'Bruno', 'lucro': Decimal('3200.50'), 'quantidade': 7},
+    {'departamento': 'Oficina', 'vendedor': 'Carla', 'lucro': Decimal('900.00'), 'quantidade': 20},
+    {'departamento': 'Funilaria', 'vendedor': 'Davi', 'lucro': Decimal('2100.00'), 'quantidade': 3},
+]
+
+class TestSessaoService(unittest.TestCase):
+    def setUp(self):
+        # Criar uma instância da aplicação para usar no contexto
+        self.app = create_app()
+        self.app.config['LLM_NIVEIS'] = [
+            {"nome": "rapido", "modelo": "mini", "prompt": "compacto", "temperatura": 0},
+            {"nome": "grande", "modelo": "grande", "prompt": "completo", "temperatura": 1},
+        ]
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.app.config['EXEMPLOS_PATH'] = os.path.join(self.diretorio.name, 'exemplos.json')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        # Remover o contexto após o teste
+        self.app_context.pop()
+        self.diretorio.cleanup()
+
+    def _refinar(self, pergunta):
+        conexao = carregar_local(LINHAS)
+        try:
+            return refinar_por_regras(conexao, LINHAS, pergunta)
+        finally:
+            conexao.close()
+
+    def test_eh_refinamento(self):
+        self.assertTrue(eh_refinamento("agora só oficina"))
+        self.assertTrue(eh_refinamento("Top 10"))
+        self.assertTrue(eh_refinamento("E desses, quais venderam mais de 10?"))
+        self.assertTrue(eh_refinamento("ordene por lucro"))
+        self.assertTrue(eh_refinamento("Dos resultados acima, quais são da oficina?"))
+        self.assertFalse(eh_refinamento("Quais serviços foram vendidos na oficina em 2024?"))
+
+    def test_perguntas_novas_nao_sao_refinamento(self):
+        for pergunta in (
+            "Quantos clientes temos?",
+            "Faturamento de 2024",
+            "Ordens de serviço canceladas",
+            "Qual o serviço mais vendido no mês anterior?",
+        ):
+            with self.subTest(pergunta=pergunta):
+                self.assertFalse(eh_refinamento(pergunta))
+
+    def test_regras(self):
+        self.assertEqual(self._refinar("top 2"), 'ORDER BY "lucro" DESC LIMIT 2')
+        self.assertEqual(self._refinar("os 3 menores por quantidade"), 'ORDER BY "quantidade" ASC LIMIT 3')
+        self.assertEqual(self._refinar("ordene por vendedor"), 'ORDER BY "vendedor" ASC')
+        self.assertEqual(
+            self._refinar("Agora só oficina, ordene por quantidade"),
+            """WHERE normalizar("departamento") = 'oficina' ORDER BY "quantidade" DESC""",
+        )
+        self.assertEqual(
+            self._refinar("apenas usados"),
+            """WHERE normalizar("departamento") LIKE '%' || 'usados' || '%' ORDER BY _linha""",
+        )
+
+    def test_regras_nao_cobrem_a_pergunta(self):
+        self.assertIsNone(self._refinar("só pintura"))
+        self.assertIsNone(self._refinar("top 5 por mês"))
+        self.assertIsNone(self._refinar("qual a média de lucro desses?"))
+
+    def test_responder_localmente_por_regras_mantem_tipos(self):
+        resposta, refinamento = responder_localmente(
+            {"pergunta": "Lucro por vendedor", "linhas": LINHAS}, "agora só oficina"
+        )
+        self.assertTrue(refinamento)
+        self.assertEqual(resposta["nivel"], "local")
+        self.assertEqual(resposta["resultados"], [LINHAS[0], LINHAS[2]])
+
+    @patch('app.services.sessao_service.gerar_query_local')
+    def test_responder_localmente_pelo_modelo_rapido(self, mock_local):
+        mock_local.return_value = "SELECT departamento, SUM(lucro) AS lucro FROM resultado GROUP BY departamento ORDER BY 1"
+
+        resposta, _ = responder_localmente(
+            {"pergunta": "Lucro por vendedor", "linhas": LINHAS}, "some o lucro por departamento"
+        )
+
+        self.assertEqual(resposta["resultados"][1], {'departamento': 'Oficina', 'lucro': 2400.0})
+        self.assertEqual(mock_local.call_args.args[0]['colunas']['lucro'], "REAL")
+        self.assertEqual(mock_local.call_args.args[3], "mini")
+
+    @patch('app.services.sessao_service.gerar_query_local')
+    def test_responder_localmente_sem_dados_suficientes(self, mock_local):
+        anterior = {"pergunta": "Lucro por vendedor", "linhas": LINHAS}
+        mock_local.side_effect = ErroTraducao("NAO_LOCAL", "nao_local")
+        self.assertEqual(responder_localmente(anterior, "e em 2023?"), (None, True))
+
+        mock_local.side_effect = ErroTraducao("NOVA_PERGUNTA", "nova_pergunta")
+        self.assertEqual(responder_localmente(anterior, "e quantos clientes temos?"), (None, False))
+
+        mock_local.side_effect = None
+        mock_local.return_value = "SELECT mes FROM resultado"
+        self.assertEqual(responder_localmente(anterior, "e por mês?"), (None, True))
+
+    def test_armazem_limita_memoria(self):
+        tamanho = estimar_bytes(LINHAS)
+        armazem = ArmazemResultados(tamanho * 2, 3600, 100)
+        armazem.guardar("a", "p", "q", LINHAS)
+        armazem.guardar("b", "p", "q", LINHAS)
+        armazem.obter("a")
+        armazem.guardar("c", "p", "q", LINHAS)
+
+        self.assertIsNotNone(armazem.obter("a"))
+        self.assertIsNone(armazem.obter("b"))
+        self.assertLessEqual(armazem.bytes, tamanho * 2)
+
+    def test_armazem_ttl_e_max_linhas(self):
+        armazem = ArmazemResultados(10 ** 7, 60, 3)
+        self.assertFalse(armazem.guardar("a", "p", "q", LINHAS))
+        self.assertFalse(armazem.guardar("a", "p", "q", []))
+
+        self.assertTrue(armazem.guardar("b", "p", "q", LINHAS[:2]))
+        armazem.obter("b")['ultimo_uso'] = time.time() - 120
+        self.assertIsNone(armazem.obter("b"))
+        self.assertEqual(armazem.bytes, 0)
+
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_refinamento_nao_volta_ao_llm_nem_ao_banco(self, mock_gerar, mock_executar):
+        mock_gerar.return_value = "SELECT d.nome AS departamento FROM departamentos d;"
+        mock_executar.return_value = LINHAS
+
+        responder_pergunta("schema", "Lucro por vendedor e departamento", "sessao-1")
+        resposta = responder_pergunta("schema", "top 1", "sessao-1")
+
+        self.assertEqual(resposta["resultados"], [LINHAS[1]])
+        self.assertEqual(mock_gerar.call_count, 1)
+        self.assertEqual(mock_executar.call_count, 1)
+
+        # O refinamento vale sobre o resultado já refinado
+        resposta = responder_pergunta("schema", "só veículos usados", "sessao-1")
+        self.assertEqual(resposta["resultados"], [LINHAS[1]])
+        self.assertEqual(resposta["nivel"], "local")
+        self.assertEqual(mock_executar.call_count, 1)
+
+    @patch('app.services.sessao_service.gerar_query_local')
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_refinamento_vai_ao_banco_com_a_pergunta_anterior(self, mock_gerar, mock_executar, mock_local):
+        mock_gerar.return_value = "SELECT d.nome AS departamento FROM departamentos d;"
+        mock_executar.return_value = LINHAS
+        mock_local.side_effect = ErroTraducao("NAO_LOCAL", "nao_local")
+
+        responder_pergunta("schema", "Lucro por vendedor e departamento", "sessao-2")
+        resposta = responder_pergunta("schema", "e em 2023?", "sessao-2")
+
+        self.assertEqual(resposta["nivel"], "rapido")
+        self.assertEqual(
+            mock_gerar.call_args.args[1], "Lucro por vendedor e departamento\nRefinamento: e em 2023?"
+        )
+
+    @patch('app.services.sessao_service.gerar_query_local')
+    @patch('app.services.roteamento_service.executar_query')
+    @patch('app.services.roteamento_service.gerar_query')
+    def test_pergunta_nova_vai_ao_banco_sem_a_anterior(self, mock_gerar, mock_executar, mock_local):
+        mock_gerar.return_value = "SELECT d.nome AS departamento FROM departamentos d;"
+        mock_executar.return_value = LINHAS
+        mock_local.side_effect = ErroTraducao("NOVA_PERGUNTA", "nova_pergunta")
+
+        responder_pergunta("schema", "Lucro por vendedor e departamento", "sessao-3")
+        responder_pergunta("schema", "E quantos clientes temos?", "sessao-3")
+        self.assertEqual(mock_local.call_count, 1)
+        self.assertEqual(mock_gerar.call_args.args[1], "E quantos clientes temos?")
+
+        # Sem marcador de refinamento, nem passa pelo nível local
+        responder_pergunta("schema", "Faturamento de 2024", "sessao-3")
+        self.assertEqual(mock_local.call_count, 1)
+        self.assertEqual(mock_gerar.call_args.args[1], "Faturamento de 2024")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,10 @@
+"""
+Ponto de entrada de produção.
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app, preaquecer
+
+app = create_app()
+preaquecer(app)